@@ -0,0 +1,65 @@
+"""
+Module: agent.bench
+
+Shared helpers for the benchmark suite.
+
+Every benchmark is a runnable module, e.g. `python -m agent.bench.turn`, and
+appends its results as a JSON line to `.agent/bench.jsonl` so runs can be compared
+across commits.
+"""
+
+import json
+import os
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from agent.config import DEFAULT_PATH_CACH
+from agent.tools.stats import percentile, summarize  # noqa: F401 (re-exported)
+
+DEFAULT_PATH_BENCH = f"{DEFAULT_PATH_CACH}/bench.jsonl"
+
+
+def revision() -> Optional[str]:
+    """Return the current git commit hash, if any."""
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(name: str, results: Dict[str, Any], path: Optional[str] = None) -> str:
+    """Append a benchmark result to the JSONL history and return its path."""
+    path = path or DEFAULT_PATH_BENCH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    entry = {
+        "name": name,
+        "revision": revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    with open(path, "a") as file:
+        file.write(json.dumps(entry) + "\n")
+    return path
+
+
+class Timer:
+    """Accumulate wall-clock time across repeated sections."""
+
+    def __init__(self):
+        self.total = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> "Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.total += time.perf_counter() - self._start
@@ -0,0 +1,161 @@
+# agent/bench/ivf.py
+"""
+Approximate RAG search benchmark.
+
+Builds a `VectorIndex` over clustered synthetic embeddings (unit vectors drawn
+around random topic centres, which is closer to real chunk embeddings than
+uniform noise), trains an `IVFIndex` on it and sweeps `nprobe`. For every
+setting it reports the mean recall@k against exact search over the same
+vectors and the query latency; the exact search latency is the baseline.
+
+Saving and loading the partition (`.npz`) is timed as well.
+
+Usage:
+    python -m agent.bench.ivf --chunks 1000000 --dim 256 --nprobe 1 4 8 16 32
+"""
+
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from agent.bench import record, summarize
+from agent.tools.vector import IVFIndex, VectorIndex
+
+BLOCK = 65536  # vectors generated at a time
+
+
+def clustered(
+    rng: np.random.Generator, count: int, centres: np.ndarray, spread: float
+) -> np.ndarray:
+    topics = rng.integers(0, len(centres), count)
+    noise = rng.standard_normal((count, centres.shape[1]), dtype=np.float32)
+    return centres[topics] + spread * noise / np.sqrt(centres.shape[1])
+
+
+def build(chunks: int, dim: int, topics: int, spread: float, seed: int):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim), dtype=np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    index = VectorIndex(dim, capacity=chunks)
+    for lo in range(0, chunks, BLOCK):
+        count = min(BLOCK, chunks - lo)
+        index.add_many(np.arange(lo + 1, lo + count + 1), clustered(rng, count, centres, spread))
+    return index, centres
+
+
+def sweep(
+    exact: VectorIndex, ivf: IVFIndex, queries: np.ndarray, top_k: int, nprobes: List[int]
+) -> Dict[str, Any]:
+    truth, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append({key for key, _ in exact.search(query, top_k)})
+        samples.append((time.perf_counter() - start) * 1e3)
+    results: Dict[str, Any] = {"exact_ms": summarize(samples)}
+    for nprobe in nprobes:
+        samples, recall = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            hits = ivf.search(query, top_k, nprobe)
+            samples.append((time.perf_counter() - start) * 1e3)
+            recall.append(len(expected & {key for key, _ in hits}) / top_k)
+        results[f"nprobe_{nprobe}"] = {
+            "recall": float(np.mean(recall)),
+            "ms": summarize(samples),
+        }
+    return results
+
+
+def run(
+    chunks: int,
+    dim: int,
+    topics: int,
+    spread: float,
+    nlist: int,
+    nprobes: List[int],
+    queries: int,
+    top_k: int,
+    seed: int,
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    exact, centres = build(chunks, dim, topics, spread, seed)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ivf = IVFIndex.train(exact, nlist or None, seed=seed)
+    train_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rag.ivf.npz")
+        start = time.perf_counter()
+        ivf.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = IVFIndex.load(path, exact)
+        load_s = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+    rng = np.random.default_rng(seed + 1)
+    probes = clustered(rng, queries, centres, spread)
+    results = {
+        "chunks": chunks,
+        "dim": dim,
+        "topics": topics,
+        "nlist": ivf.nlist,
+        "top_k": top_k,
+        "build_s": build_s,
+        "train_s": train_s,
+        "save_s": save_s,
+        "load_s": load_s,
+        "file_bytes": size,
+    }
+    results.update(sweep(exact, loaded, probes, top_k, nprobes))
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark IVF recall@k and latency.")
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="Indexed chunks")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--topics", type=int, default=4096, help="Synthetic clusters")
+    parser.add_argument("--spread", type=float, default=1.0, help="Noise around a topic")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0: sqrt(chunks))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=100, help="Queries to time")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    results = run(
+        args.chunks,
+        args.dim,
+        args.topics,
+        args.spread,
+        args.nlist,
+        args.nprobe,
+        args.queries,
+        args.top_k,
+        args.seed,
+    )
+    print(f"build: {results['build_s']:.2f}s for {args.chunks} chunks x {args.dim} dims")
+    print(f"train: {results['train_s']:.2f}s for {results['nlist']} lists")
+    print(
+        f"save:  {results['save_s']:.2f}s, load: {results['load_s']:.2f}s, "
+        f"{results['file_bytes'] / 1024**2:.1f} MiB"
+    )
+    s = results["exact_ms"]
+    print(f"exact:      recall 1.000  p50 {s['p50']:8.2f}ms  p95 {s['p95']:8.2f}ms")
+    for nprobe in args.nprobe:
+        r = results[f"nprobe_{nprobe}"]
+        s = r["ms"]
+        print(
+            f"nprobe {nprobe:<3} recall {r['recall']:.3f}  "
+            f"p50 {s['p50']:8.2f}ms  p95 {s['p95']:8.2f}ms"
+        )
+    print(f"recorded -> {record('ivf', results, args.output)}")
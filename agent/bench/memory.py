@@ -0,0 +1,175 @@
+# agent/bench/memory.py
+"""
+Memory recall benchmark.
+
+Fills a scratch database with synthetic memories, migrates it to the FTS5 index
+the way `memory_initialize` does for an existing database, and compares the
+latency of BM25-ranked recall against the previous `LIKE '%query%'` scan for the
+same queries. Point lookups are timed on a pooled connection (`database_connect`)
+and on a fresh connection per operation, as before. Semantic recall is measured separately on random unit vectors of
+the embedding model's width (`VectorIndex.search`), together with the cost of
+adding a memory to the in-memory index; the embedding request itself is not
+included.
+
+Usage:
+    python -m agent.bench.memory --memories 100000 --queries 200 --dim 1024
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from agent.bench import record, summarize
+from agent.config import config
+from agent.tools import memory
+from agent.tools.database import database_close, database_connect
+from agent.tools.vector import VectorIndex
+
+SUBJECTS = ["user", "project", "server", "build", "team", "client", "database", "editor"]
+VERBS = ["prefers", "uses", "needs", "avoids", "runs", "deploys", "expects", "mentions"]
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choices(letters, k=rng.randint(4, 9))) for _ in range(size)]
+
+
+def memories(count: int, words: List[str], rng: random.Random) -> List[str]:
+    return [
+        f"The {rng.choice(SUBJECTS)} {rng.choice(VERBS)} "
+        + " ".join(rng.choices(words, k=rng.randint(6, 18)))
+        for _ in range(count)
+    ]
+
+
+def time_queries(queries: List[str], search) -> List[float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append((time.perf_counter() - start) * 1e3)
+    return samples
+
+
+def time_lookups(path: str, count: int, repeat: int, pooled: bool) -> float:
+    """Return microseconds per primary key lookup."""
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn = database_connect(path) if pooled else sqlite3.connect(path)
+        with conn:
+            conn.execute(
+                "SELECT content FROM memories WHERE id = ?", (rng.randint(1, count),)
+            ).fetchone()
+        if not pooled:
+            conn.close()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def time_vectors(count: int, queries: int, dim: int, seed: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    index = VectorIndex(dim)
+    vectors = rng.standard_normal((count, dim), dtype=np.float32)
+    start = time.perf_counter()
+    for i, vector in enumerate(vectors):
+        index.add(i, vector)
+    add_us = (time.perf_counter() - start) / count * 1e6
+    probes = rng.standard_normal((queries, dim), dtype=np.float32)
+    return {
+        "vector_add_us": add_us,
+        "vector_ms": summarize(time_queries(list(probes), lambda v: index.search(v, 5))),
+    }
+
+
+def run(count: int, queries: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    words = vocabulary(5000, rng)
+    rows = memories(count, words, rng)
+    single = [rng.choice(words) for _ in range(queries)]
+    multi = [" ".join(rng.sample(words, 2)) for _ in range(queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory.DB_PATH = os.path.join(tmp, "memory.sqlite3")
+        memory._fts_ready = None
+        config.set_value("memory.semantic", False)  # full-text lookups only
+
+        # a database from before the FTS index
+        with memory.memory_connect() as conn:
+            conn.execute(
+                "CREATE TABLE memories (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "timestamp DATETIME DEFAULT (datetime('now', 'localtime')), "
+                "content TEXT NOT NULL)"
+            )
+            conn.executemany("INSERT INTO memories (content) VALUES (?)", [(r,) for r in rows])
+
+        def like(query: str) -> str:
+            memory._fts_ready = False
+            return memory.memory_search(query, limit=5)
+
+        like_single = time_queries(single, like)
+        like_multi = time_queries(multi, like)
+
+        start = time.perf_counter()
+        memory.memory_initialize()
+        migrate_s = time.perf_counter() - start
+        if not memory._fts_ready:
+            raise SystemExit("SQLite was built without FTS5.")
+
+        def fts(query: str) -> str:
+            return memory.memory_search(query, limit=5)
+
+        fts_single = time_queries(single, fts)
+        fts_multi = time_queries(multi, fts)
+
+        start = time.perf_counter()
+        for row in rows[:1000]:
+            memory.memory_create(row)
+        insert_ms = (time.perf_counter() - start) / 1000 * 1e3
+
+        pooled_us = time_lookups(memory.DB_PATH, count, 10 * queries, pooled=True)
+        fresh_us = time_lookups(memory.DB_PATH, count, 10 * queries, pooled=False)
+        database_close(memory.DB_PATH)
+
+    return {
+        "memories": count,
+        "queries": queries,
+        "migrate_s": migrate_s,
+        "insert_ms": insert_ms,
+        "lookup_pooled_us": pooled_us,
+        "lookup_fresh_us": fresh_us,
+        "like_single_ms": summarize(like_single),
+        "like_multi_ms": summarize(like_multi),
+        "fts_single_ms": summarize(fts_single),
+        "fts_multi_ms": summarize(fts_multi),
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark memory recall (FTS5 vs LIKE).")
+    parser.add_argument("--memories", type=int, default=100_000, help="Stored memories")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per case")
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimensions")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    results = run(args.memories, args.queries, args.seed)
+    results.update(time_vectors(args.memories, args.queries, args.dim, args.seed))
+    results["dim"] = args.dim
+    print(f"migration: {results['migrate_s']:.2f}s, insert: {results['insert_ms']:.3f}ms/memory")
+    print(
+        f"lookup: {results['lookup_pooled_us']:.1f}us pooled, "
+        f"{results['lookup_fresh_us']:.1f}us with a new connection"
+    )
+    print(f"vector index: {results['vector_add_us']:.2f}us/add")
+    for case in ("like_single", "fts_single", "like_multi", "fts_multi", "vector"):
+        s = results[f"{case}_ms"]
+        print(f"  {case:<12} p50 {s['p50']:8.3f}ms  p95 {s['p95']:8.3f}ms  max {s['max']:8.3f}ms")
+    print(f"recorded -> {record('memory', results, args.output)}")
@@ -0,0 +1,127 @@
+# agent/bench/quantize.py
+"""
+Quantized RAG search benchmark.
+
+Builds float32, int8 and binary indexes over the same clustered synthetic
+embeddings (see `agent.bench.ivf`) and reports, for each quantization:
+    - the memory held by the vectors or codes,
+    - recall@k of the quantized scores alone against exact float search,
+    - recall@k after re-scoring the best `k * oversample` candidates with
+      their float vectors, as `RagIndex` does,
+    - the latency of the quantized candidate search.
+
+Re-scoring reads the float vectors from memory here; `RagIndex` reads the same
+few rows from SQLite, which adds a point query per search.
+
+Usage:
+    python -m agent.bench.quantize --chunks 1000000 --dim 1024 --oversample 4
+"""
+
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from agent.bench import record, summarize
+from agent.bench.ivf import build, clustered
+from agent.tools.vector import QUANTIZE_MODES, QuantizedIndex, top_k
+
+
+def recall(expected: set, hits: list, k: int) -> float:
+    return len(expected & {key for key, _ in hits[:k]}) / k
+
+
+def run(
+    chunks: int,
+    dim: int,
+    topics: int,
+    spread: float,
+    queries: int,
+    k: int,
+    oversample: int,
+    seed: int,
+) -> Dict[str, Any]:
+    exact, centres = build(chunks, dim, topics, spread, seed)
+    matrix, keys = exact.matrix, exact.keys
+    probes = clustered(np.random.default_rng(seed + 1), queries, centres, spread)
+
+    samples, truth = [], []
+    for query in probes:
+        start = time.perf_counter()
+        truth.append({key for key, _ in exact.search(query, k)})
+        samples.append((time.perf_counter() - start) * 1e3)
+    results: Dict[str, Any] = {
+        "chunks": chunks,
+        "dim": dim,
+        "top_k": k,
+        "oversample": oversample,
+        "float32": {"bytes": matrix.nbytes, "ms": summarize(samples)},
+    }
+
+    rows = {int(key): row for row, key in enumerate(keys)}
+    for mode in QUANTIZE_MODES:
+        index = QuantizedIndex(mode, dim, capacity=chunks)
+        start = time.perf_counter()
+        for lo in range(0, chunks, 65536):
+            index.add_many(keys[lo : lo + 65536], matrix[lo : lo + 65536])
+        build_s = time.perf_counter() - start
+
+        samples, approx, rescored = [], [], []
+        for query, expected in zip(probes, truth):
+            start = time.perf_counter()
+            candidates = index.search(query, k * oversample)
+            samples.append((time.perf_counter() - start) * 1e3)
+            approx.append(recall(expected, candidates, k))
+            found = np.array([rows[key] for key, _ in candidates])
+            scores = matrix[found] @ (query / np.linalg.norm(query))
+            best = top_k(scores, k)
+            rescored.append(recall(expected, [(int(keys[found[i]]), 0.0) for i in best], k))
+        results[mode] = {
+            "bytes": index.nbytes,
+            "build_s": build_s,
+            "recall": float(np.mean(approx)),
+            "recall_rescored": float(np.mean(rescored)),
+            "ms": summarize(samples),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark int8 and binary quantized search.")
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="Indexed chunks")
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimensions")
+    parser.add_argument("--topics", type=int, default=4096, help="Synthetic clusters")
+    parser.add_argument("--spread", type=float, default=1.0, help="Noise around a topic")
+    parser.add_argument("--queries", type=int, default=50, help="Queries to time")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--oversample", type=int, default=4, help="Candidates per result")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    results = run(
+        args.chunks,
+        args.dim,
+        args.topics,
+        args.spread,
+        args.queries,
+        args.top_k,
+        args.oversample,
+        args.seed,
+    )
+    base = results["float32"]
+    print(f"{args.chunks} chunks x {args.dim} dims, recall@{args.top_k}")
+    print(
+        f"float32  {base['bytes'] / 1024**2:8.1f} MiB          recall 1.000"
+        f"                  p50 {base['ms']['p50']:8.2f}ms"
+    )
+    for mode in QUANTIZE_MODES:
+        r = results[mode]
+        print(
+            f"{mode:<8} {r['bytes'] / 1024**2:8.1f} MiB ({base['bytes'] / r['bytes']:4.1f}x)"
+            f"  recall {r['recall']:.3f}, rescored {r['recall_rescored']:.3f}"
+            f"  p50 {r['ms']['p50']:8.2f}ms"
+        )
+    print(f"recorded -> {record('quantize', results, args.output)}")
@@ -0,0 +1,152 @@
+# agent/bench/rag.py
+"""
+RAG search benchmark.
+
+Builds a `RagIndex` over random unit vectors and measures top-k latency of the
+single matrix-vector product against the previous strategy: a Python loop that
+computes `cosine()` for every stored vector and sorts the full list. The loop is
+timed on a smaller sample and extrapolated linearly; on that sample both
+strategies must return the same chunks.
+
+Loading the index from SQLite (`rag_vectors`) is timed on a scratch database.
+
+Usage:
+    python -m agent.bench.rag --chunks 1000000 --dim 256 --queries 50
+"""
+
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from agent.bench import record, summarize
+from agent.cli import embed
+from agent.tools.database import database_close
+
+BLOCK = 65536  # vectors generated and inserted at a time
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> float:
+    """The per-row similarity used before the index."""
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def loop_search(rows: List[tuple], query: np.ndarray, top_k: int) -> List[int]:
+    scores = [(cosine(query, vector), key) for key, vector in rows]
+    scores.sort(reverse=True, key=lambda x: x[0])
+    return [key for _, key in scores[:top_k]]
+
+
+def build(index: embed.RagIndex, chunks: int, dim: int, seed: int) -> float:
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for lo in range(0, chunks, BLOCK):
+        count = min(BLOCK, chunks - lo)
+        vectors = rng.standard_normal((count, dim), dtype=np.float32)
+        index.add(np.arange(lo + 1, lo + count + 1), vectors)
+    return time.perf_counter() - start
+
+
+def time_search(index: embed.RagIndex, queries: np.ndarray, top_k: int) -> List[float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.vectors.search(query, top_k)
+        samples.append((time.perf_counter() - start) * 1e3)
+    return samples
+
+
+def time_loop(sample: int, dim: int, queries: np.ndarray, top_k: int, seed: int) -> float:
+    """Return ms per query for the Python loop; checks it against the index."""
+    rng = np.random.default_rng(seed + 1)
+    vectors = rng.standard_normal((sample, dim), dtype=np.float32)
+    rows = [(i + 1, vector) for i, vector in enumerate(vectors)]
+    index = embed.RagIndex()
+    index.add(np.arange(1, sample + 1), vectors)
+
+    total = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        expected = loop_search(rows, query, top_k)
+        total += time.perf_counter() - start
+        found = [key for key, _ in index.vectors.search(query, top_k)]
+        if found != expected:
+            raise SystemExit(f"index returned {found}, loop returned {expected}")
+    return total / len(queries) * 1e3
+
+
+def time_load(count: int, dim: int, seed: int) -> float:
+    """Return seconds to load `count` stored vectors into a RagIndex."""
+    rng = np.random.default_rng(seed + 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        embed.DB_PATH = os.path.join(tmp, "rag.sqlite3")
+        embed.rag_initialize()
+        for lo in range(0, count, BLOCK):
+            vectors = rng.standard_normal((min(BLOCK, count - lo), dim), dtype=np.float32)
+            with embed.rag_connect() as conn:
+                conn.executemany(
+                    embed.RAG_INSERT,
+                    [embed.rag_row("bench", lo + i, "", v) for i, v in enumerate(vectors)],
+                )
+        start = time.perf_counter()
+        index = embed.RagIndex().load()
+        elapsed = time.perf_counter() - start
+        assert len(index) == count
+        database_close(embed.DB_PATH)
+    return elapsed
+
+
+def run(
+    chunks: int, dim: int, queries: int, top_k: int, sample: int, load: int, seed: int
+) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed + 3)
+    probes = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    loop_ms = time_loop(sample, dim, probes[: min(queries, 5)], top_k, seed)
+    load_s = time_load(load, dim, seed) if load else 0.0
+
+    index = embed.RagIndex()
+    build_s = build(index, chunks, dim, seed)
+    search = summarize(time_search(index, probes, top_k))
+    return {
+        "chunks": chunks,
+        "dim": dim,
+        "top_k": top_k,
+        "build_s": build_s,
+        "load_rows": load,
+        "load_s": load_s,
+        "search_ms": search,
+        "loop_sample": sample,
+        "loop_ms": loop_ms,
+        "loop_ms_extrapolated": loop_ms * chunks / sample,
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark RAG top-k search.")
+    parser.add_argument("--chunks", type=int, default=1_000_000, help="Indexed chunks")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--queries", type=int, default=50, help="Queries to time")
+    parser.add_argument("--top-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--sample", type=int, default=50_000, help="Chunks for the loop")
+    parser.add_argument("--load", type=int, default=100_000, help="Chunks loaded from SQLite")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    results = run(
+        args.chunks, args.dim, args.queries, args.top_k, args.sample, args.load, args.seed
+    )
+    s = results["search_ms"]
+    print(f"build: {results['build_s']:.2f}s for {args.chunks} chunks x {args.dim} dims")
+    print(f"load:  {results['load_s']:.2f}s for {args.load} chunks from SQLite")
+    print(f"index: p50 {s['p50']:.2f}ms  p95 {s['p95']:.2f}ms  max {s['max']:.2f}ms")
+    print(
+        f"loop:  {results['loop_ms']:.1f}ms at {args.sample} chunks, "
+        f"~{results['loop_ms_extrapolated']:.0f}ms extrapolated"
+    )
+    print(f"recorded -> {record('rag', results, args.output)}")
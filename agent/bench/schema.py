@@ -0,0 +1,90 @@
+# agent/bench/schema.py
+"""
+Tool argument validation benchmark.
+
+Measures the per-call cost of the compiled validators in `agent.tools.schema`
+for representative (valid and coerced) arguments of every built-in tool, and
+the share of `ToolRegistry.call` they account for when the tool itself is a
+no-op stub.
+
+Usage:
+    python -m agent.bench.schema --repeat 100000
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+
+from agent.bench import record
+from agent.tools import _weather, tools
+from agent.tools.registry import ToolRegistry
+from agent.tools.schema import compile_tools
+
+CALLS: List[Tuple[str, Dict[str, Any]]] = [
+    ("weather", {"location": "Paris, FR", "units": "metric"}),
+    ("access", {}),
+    ("shell", {"program": "git status --short"}),
+    ("read", {"filepath": "agent/tools/registry.py", "start_line": 1, "end_line": 40}),
+    ("read", {"filepath": "agent/tools/registry.py", "start_line": "10", "end_line": None}),
+    ("write", {"filepath": "notes.txt", "content": "hello\n", "start_line": 3}),
+    ("store", {"fact": "The user prefers metric units."}),
+    ("recall", {"query": "units"}),
+    ("forget", {"query": "units"}),
+]
+
+
+def time_validators(repeat: int) -> Dict[str, float]:
+    """Return microseconds per validation for each call."""
+    validators = compile_tools(_weather + tools)
+    results = {}
+    for i, (name, args) in enumerate(CALLS):
+        validate = validators[name]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            validate(args, name)
+        results[f"{i}:{name}"] = (time.perf_counter() - start) / repeat * 1e6
+    return results
+
+
+def time_registry(repeat: int, validate: bool) -> float:
+    """Return microseconds per `ToolRegistry.call` with stubbed tools."""
+    registry = ToolRegistry()
+    registry.cache = registry.tracer = None  # measure dispatch overhead only
+    for name in list(registry._tools):
+        registry.register(name, lambda **kwargs: "ok")
+    if not validate:
+        registry._validators = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, args in CALLS:
+            registry.call(name, **args)
+    registry.close()
+    return (time.perf_counter() - start) / (repeat * len(CALLS)) * 1e6
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark tool argument validation.")
+    parser.add_argument("--repeat", type=int, default=100_000, help="Calls per case")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    validators = time_validators(args.repeat)
+    for case, us in validators.items():
+        print(f"  {case:<12} {us:8.2f}us")
+    mean = sum(validators.values()) / len(validators)
+    print(f"  {'mean':<12} {mean:8.2f}us")
+
+    repeat = max(1, args.repeat // 10)
+    with_validation = time_registry(repeat, validate=True)
+    without = time_registry(repeat, validate=False)
+    print(f"registry.call: {with_validation:.2f}us validated, {without:.2f}us unvalidated")
+
+    results = {
+        "repeat": args.repeat,
+        "validate_us": validators,
+        "validate_mean_us": mean,
+        "call_validated_us": with_validation,
+        "call_unvalidated_us": without,
+    }
+    print(f"recorded -> {record('schema', results, args.output)}")
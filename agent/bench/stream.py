@@ -0,0 +1,103 @@
+# agent/bench/stream.py
+"""
+Streaming tool-argument assembly benchmark.
+
+Streams a `write` tool call whose arguments carry a multi-megabyte file through
+`classify_event` and compares it against the previous strategy of re-joining all
+fragments and calling `json.loads` whenever a fragment ends with `}`.
+
+The payload is C-like source full of braces, escaped quotes, backslashes and
+non-ASCII text, and the fragments are cut at a fixed width so that escapes and
+multi-byte characters regularly straddle fragment boundaries. Both strategies
+must decode the payload exactly; a mismatch aborts the run.
+
+Usage:
+    python -m agent.bench.stream --size 4000000 --width 8
+"""
+
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from agent.bench import record
+from agent.cli.__main__ import classify_event
+from agent.llama.fake import fake_chunks
+
+SOURCE = 'int main(void) {\n    printf("\\"héllo\\" {%s}\\n", "wörld\\\\");\n}\n'
+
+
+def payload(size: int) -> Dict[str, Any]:
+    content = (SOURCE * (size // len(SOURCE) + 1))[:size]
+    return {"filepath": "big.c", "content": content}
+
+
+def fragments(arguments: str, width: int) -> List[str]:
+    return [arguments[i : i + width] for i in range(0, len(arguments), width)]
+
+
+def stream(parts: List[str]) -> Iterator[Dict[str, Any]]:
+    head = {"index": 0, "id": "call_0", "type": "function", "function": {"name": "write"}}
+    deltas = [{"tool_calls": [head]}]
+    deltas.extend({"tool_calls": [{"index": 0, "function": {"arguments": p}}]} for p in parts)
+    return fake_chunks(deltas, created=0)
+
+
+def rejoin(parts: List[str], limit: float) -> Optional[Dict[str, Any]]:
+    """The previous strategy. Gives up once `limit` seconds have elapsed."""
+    start = time.perf_counter()
+    collected = []
+    for part in parts:
+        collected.append(part)
+        if part.strip().endswith("}"):
+            try:
+                return json.loads("".join(collected))
+            except json.JSONDecodeError:
+                if time.perf_counter() - start > limit:
+                    return None
+    return None
+
+
+def assemble(parts: List[str]) -> Optional[Dict[str, Any]]:
+    for event in classify_event(stream(parts)):
+        if event.get("tool_call"):
+            return event["tool_call"]["arguments"]
+    return None
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark streamed tool-argument assembly.")
+    parser.add_argument("--size", type=int, default=4_000_000, help="Content bytes")
+    parser.add_argument("--width", type=int, default=8, help="Characters per fragment")
+    parser.add_argument("--limit", type=float, default=60.0, help="Re-join time limit (s)")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    expected = payload(args.size)
+    parts = fragments(json.dumps(expected, ensure_ascii=False), args.width)
+    print(f"fragments: {len(parts)}")
+
+    start = time.perf_counter()
+    result = assemble(parts)
+    assembled = time.perf_counter() - start
+    if result != expected:
+        raise SystemExit("assembler decoded the payload incorrectly")
+    print(f"assembler: {assembled:.3f}s")
+
+    start = time.perf_counter()
+    result = rejoin(parts, args.limit)
+    rejoined = time.perf_counter() - start
+    if result is not None and result != expected:
+        raise SystemExit("re-join decoded the payload incorrectly")
+    print(f"re-join:   {rejoined:.3f}s{'' if result else ' (gave up)'}")
+
+    results = {
+        "size": args.size,
+        "width": args.width,
+        "fragments": len(parts),
+        "assembler_s": assembled,
+        "rejoin_s": rejoined,
+        "rejoin_completed": result is not None,
+    }
+    print(f"recorded -> {record('stream', results, args.output)}")
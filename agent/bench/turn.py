@@ -0,0 +1,196 @@
+# agent/bench/turn.py
+"""
+End-to-end agent turn benchmark.
+
+Replays recorded (or synthetic) SSE streams through `run_agent` with rendering
+disabled and reports the per-turn overhead of the hot loop:
+
+    run_agent -> classify_event -> tool dispatch -> messages.sync
+
+Time is split into three buckets:
+
+- parse:   stream consumption, event classification, and message bookkeeping.
+- tool:    time spent inside `ToolRegistry.dispatch_all`.
+- persist: time spent saving the session after user input and agent turns.
+
+Allocations are measured in a second pass with `tracemalloc` so that tracing does
+not skew the timings. Replay files use the same JSONL turn format as
+`agent.llama.fake`. Tool calls in the replay are answered by stubs that return a
+payload of `--result-size` bytes, so no tool has real side effects.
+
+Usage:
+    python -m agent.bench.turn --turns 200
+    python -m agent.bench.turn --replay session.jsonl --output bench.jsonl
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import tracemalloc
+from typing import Any, Dict, Iterator, List
+
+from agent.bench import Timer, record, summarize
+from agent.cli.__main__ import run_agent
+from agent.cli.session import SessionJournal
+from agent.llama.fake import fake_chunks, fake_replay
+from agent.tools.registry import ToolRegistry
+
+
+def synthetic_turns(payload: int = 4096) -> List[List[Dict[str, Any]]]:
+    """Return a reasoning + parallel tool call turn and a plain content turn."""
+    read = json.dumps({"filepath": "README.md", "start_line": 1, "end_line": 40})
+    recall = json.dumps({"query": "benchmark", "limit": 5})
+    calls = [("read", read), ("recall", recall)]
+    text = "lorem ipsum dolor sit amet " * max(1, payload // 27)
+    words = [f"{w} " for w in text.split()]
+
+    tool_turn = [{"reasoning_content": w} for w in words[:64]]
+    tool_turn.append({"reasoning_content": None})
+    for index, (name, _) in enumerate(calls):
+        head = {"index": index, "id": f"call_{index}", "type": "function"}
+        head["function"] = {"name": name}
+        tool_turn.append({"tool_calls": [head]})
+    # interleave the argument fragments of both calls
+    for offset in range(0, max(len(args) for _, args in calls), 8):
+        for index, (_, args) in enumerate(calls):
+            if offset < len(args):
+                fragment = {"arguments": args[offset : offset + 8]}
+                tool_turn.append({"tool_calls": [{"index": index, "function": fragment}]})
+
+    reply_turn = [{"reasoning_content": w} for w in words[:32]]
+    reply_turn.append({"reasoning_content": None})
+    reply_turn.extend({"content": w} for w in words)
+    return [tool_turn, reply_turn]
+
+
+class ReplayCompletion:
+    """Stand-in for `LlamaCppCompletion.chat` that replays recorded turns."""
+
+    def __init__(self, turns: List[List[Dict[str, Any]]]):
+        self.turns = turns
+        self.index = 0
+
+    def chat(self, model: str, messages: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        deltas = self.turns[self.index % len(self.turns)]
+        self.index += 1
+        return fake_chunks(deltas, model, created=0)
+
+
+class TimedRegistry(ToolRegistry):
+    """Registry whose tools are stubs and whose dispatch time is recorded."""
+
+    def __init__(self, result_size: int):
+        super().__init__()
+        result = "x" * result_size
+        for name in list(self._tools):
+            self.register(name, lambda result=result, **kwargs: result)
+        self.timer = Timer()
+
+    def dispatch_all(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        with self.timer:
+            return super().dispatch_all(tool_calls)
+
+
+def run_turns(
+    turns: List[List[Dict[str, Any]]],
+    n_turns: int,
+    result_size: int,
+    directory: str,
+) -> Dict[str, List[float]]:
+    """Drive the CLI loop for `n_turns` agent turns and collect timings."""
+    completion = ReplayCompletion(turns)
+    registry = TimedRegistry(result_size)
+    messages = SessionJournal(
+        os.path.join(directory, "session.jsonl"),
+        initial_data=[{"role": "system", "content": "You are a benchmark."}],
+    )
+    messages.create()
+
+    samples = {"total": [], "parse": [], "tool": [], "persist": []}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(n_turns):
+            persist = Timer()
+            registry.timer.total = 0.0
+
+            with Timer() as total:
+                if messages.data[-1]["role"] != "tool":
+                    messages.append({"role": "user", "content": f"turn {i}"})
+                    with persist:
+                        messages.sync()
+
+                with Timer() as agent:
+                    run_agent("bench", completion, messages, registry)
+
+                with persist:
+                    messages.sync()
+
+            samples["total"].append(total.total)
+            samples["parse"].append(agent.total - registry.timer.total)
+            samples["tool"].append(registry.timer.total)
+            samples["persist"].append(persist.total)
+
+    messages.close()
+    registry.close()
+    return samples
+
+
+def run_allocations(
+    turns: List[List[Dict[str, Any]]],
+    n_turns: int,
+    result_size: int,
+    directory: str,
+) -> Dict[str, float]:
+    """Repeat the loop under `tracemalloc` and report bytes per turn."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        run_turns(turns, n_turns, result_size, directory)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "retained_bytes_per_turn": (after - before) / max(1, n_turns),
+        "peak_bytes": peak,
+    }
+
+
+def to_us(samples: List[float]) -> Dict[str, float]:
+    return {k: round(v * 1e6, 1) for k, v in summarize(samples).items()}
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Benchmark the agent turn loop.")
+    parser.add_argument("--replay", default=None, help="JSONL file of recorded turns")
+    parser.add_argument("--turns", type=int, default=100, help="Agent turns to run")
+    parser.add_argument("--payload", type=int, default=4096, help="Synthetic reply bytes")
+    parser.add_argument("--result-size", type=int, default=2048, help="Tool result bytes")
+    parser.add_argument("--output", default=None, help="Result history (JSONL)")
+    args = parser.parse_args()
+
+    turns = fake_replay(args.replay) if args.replay else synthetic_turns(args.payload)
+
+    with tempfile.TemporaryDirectory() as directory:
+        samples = run_turns(turns, args.turns, args.result_size, directory)
+    with tempfile.TemporaryDirectory() as directory:
+        allocations = run_allocations(turns, args.turns, args.result_size, directory)
+
+    results = {
+        "turns": args.turns,
+        "replay": args.replay,
+        "time_us": {name: to_us(values) for name, values in samples.items()},
+        "allocations": allocations,
+    }
+
+    print(f"turns: {args.turns}")
+    for name, stats in results["time_us"].items():
+        print(
+            f"  {name:<8} mean {stats['mean']:>10.1f}us"
+            f"  p50 {stats['p50']:>10.1f}us"
+            f"  p95 {stats['p95']:>10.1f}us"
+        )
+    print(f"  retained {allocations['retained_bytes_per_turn']:.0f} bytes/turn")
+    print(f"  peak     {allocations['peak_bytes']} bytes")
+    print(f"recorded -> {record('turn', results, args.output)}")
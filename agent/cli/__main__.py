@@ -1,22 +1,25 @@
 # agent/cli/__main__.py
 import json
 import os
+import re
 import shutil
 import subprocess
 import sys
 import time
 import traceback
+import uuid
 from argparse import ArgumentParser, Namespace
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
-from jsonpycraft import JSONFileErrorHandler, JSONListTemplate
 from prompt_toolkit import PromptSession
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.history import FileHistory
 from requests.exceptions import HTTPError
 
+from agent.cli.context import CONTEXT_POLICIES, ContextWindow, chat_summarizer
+from agent.cli.session import SessionJournal
 from agent.config import DEFAULT_PATH_MSGS, config
 from agent.llama.client import (
     LlamaCppCompletion,
@@ -24,7 +27,9 @@ from agent.llama.client import (
     LlamaCppRequest,
     LlamaCppRouter,
     LlamaCppServer,
+    LlamaCppTokenizer,
 )
+from agent.tools.consolidate import MemoryConsolidator
 from agent.tools.memory import memory_initialize
 from agent.tools.registry import ToolRegistry
 
@@ -67,28 +72,113 @@ FG_GOLD = fg_256(214)  # orange-ish yellow
 # --- model output classifiers ---
 
 
+class JSONAssembler:
+    """
+    Incrementally assemble a JSON value from streamed fragments.
+
+    Each fragment is scanned once for structural characters while tracking brace
+    depth and string state, so the cost per fragment is proportional to its own
+    length. String bodies (e.g. file contents) are skipped with a single regex
+    search. The fragments are joined and decoded exactly once, when the top-level
+    value closes.
+    """
+
+    _STRUCTURE = re.compile(r'[{}\[\]"]')
+    _STRING = re.compile(r'["\\]')
+
+    def __init__(self):
+        self.fragments: list[str] = []
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False  # a backslash ended the previous fragment
+
+    def feed(self, fragment: str) -> bool:
+        """Consume a fragment and return True once the top-level value closes."""
+        self.fragments.append(fragment)
+        pos, size = 0, len(fragment)
+        if self.escaped and size:
+            pos, self.escaped = 1, False
+
+        while pos < size:
+            if self.in_string:
+                m = self._STRING.search(fragment, pos)
+                if m is None:
+                    break
+                if m.group() == "\\":
+                    if m.end() >= size:
+                        self.escaped = True
+                        break
+                    pos = m.end() + 1
+                    continue
+                self.in_string = False
+                pos = m.end()
+                continue
+
+            m = self._STRUCTURE.search(fragment, pos)
+            if m is None:
+                break
+            pos = m.end()
+            char = m.group()
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.started = True
+            else:
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    return True
+        return False
+
+    def text(self) -> str:
+        return "".join(self.fragments)
+
+    def reset(self) -> None:
+        self.__init__()
+
+
 def classify_tool(
     tool_call: dict[str, any],
-    buffer: dict[str, any],
-    args_fragments: list[str],
+    buffers: dict[int, dict[str, any]],
 ) -> Optional[dict[str, any]]:
-    fn = tool_call["function"]
+    # parallel calls are interleaved in the stream and keyed by their index
+    index = tool_call.get("index", 0)
+    if index not in buffers:
+        buffers[index] = {
+            "index": index,
+            "id": tool_call.get("id") or f"call_{uuid.uuid4().hex[:24]}",
+            "name": None,
+            "assembler": JSONAssembler(),
+        }
+    buffer = buffers[index]
+
+    fn = tool_call.get("function", {})
     if fn.get("name"):
         buffer["name"] = fn["name"]
-    if fn.get("arguments"):
-        args_fragments.append(fn["arguments"])
-    if fn.get("arguments") and fn["arguments"].strip().endswith("}"):
-        try:
-            args = "".join(args_fragments)
-            buffer["arguments"] = json.loads(args)
-            args_fragments.clear()
-            return {"tool_call": buffer.copy()}
-        except json.JSONDecodeError as e:
-            if os.getenv("DEBUG_TOOL_JSON"):
-                print(f"[warn] tool_call args error: {e} :: {''.join(args_fragments)}")
+    if fn.get("arguments") and buffer["assembler"].feed(fn["arguments"]):
+        return classify_arguments(buffers.pop(index))
     return None
 
 
+def classify_arguments(buffer: dict[str, any]) -> Optional[dict[str, any]]:
+    args = buffer["assembler"].text()
+    try:
+        arguments = json.loads(args) if args.strip() else {}
+    except json.JSONDecodeError as e:
+        if os.getenv("DEBUG_TOOL_JSON"):
+            print(f"[warn] tool_call args error: {e} :: {args}")
+        return None
+    return {
+        "tool_call": {
+            "index": buffer["index"],
+            "id": buffer["id"],
+            "name": buffer["name"],
+            "arguments": arguments,
+        }
+    }
+
+
 def classify_reasoning(content: str, active: bool) -> tuple[Optional[dict], bool]:
     if content and not active:
         return {"reasoning.open": content}, True
@@ -103,8 +193,7 @@ def classify_reasoning(content: str, active: bool) -> tuple[Optional[dict], bool
 
 
 def classify_event(generator):
-    tool_buffer = {}
-    args_fragments = []
+    tool_buffers = {}
     reasoning_active = False
 
     for chunk in generator:
@@ -123,55 +212,67 @@ def classify_event(generator):
 
         if delta.get("tool_calls"):
             for tool_call in delta["tool_calls"]:
-                result = classify_tool(tool_call, tool_buffer, args_fragments)
+                result = classify_tool(tool_call, tool_buffers)
                 if result:
                     yield result
 
+    # flush calls whose arguments never closed (e.g. tools without parameters)
+    for index in sorted(tool_buffers):
+        buffer = tool_buffers[index]
+        if buffer["name"]:
+            result = classify_arguments(buffer)
+            if result:
+                yield result
+
 
 def run_agent(
     model: str,
     completion: LlamaCppCompletion,
-    messages: JSONListTemplate,
+    messages: SessionJournal,
     registry: ToolRegistry,
+    context: Optional[ContextWindow] = None,
 ) -> None:
-    tool_call_pending = False
-    message = {"role": "assistant", "content": ""}
-    generator = completion.chat(model, messages.data)
+    tool_calls = []
+    parts = []  # joined once per message instead of repeated `+=`
+    prompt = context.fit(messages.data) if context else messages.data
+    generator = completion.chat(model, prompt)
 
     for event in classify_event(generator):
         if event.get("reasoning"):
-            message["content"] += event["reasoning"]
+            parts.append(event["reasoning"])
             print(event["reasoning"], end="")
         elif event.get("reasoning.open"):
-            message["content"] += event["reasoning.open"]
+            parts.append(event["reasoning.open"])
             print(f"\n{BOLD}{FG_BLUE}thinking{RESET}")
             print(event["reasoning.open"], end="")
         elif event.get("reasoning.close"):
-            message["content"] += event["reasoning.close"]
+            parts.append(event["reasoning.close"])
             print(f"\n\n{BOLD}{FG_GREEN}completion{RESET}")
         elif event.get("content"):
-            message["content"] += event["content"]
+            parts.append(event["content"])
             print(event["content"], end="")
         elif event.get("tool_call"):
-            if message["content"]:
-                messages.append(message)
-
-            tool_req = registry.request(event)
-            messages.append(tool_req)
-
-            tool_res = registry.dispatch(event)
-            messages.append(tool_res)
-
-            tool_call_pending = True
+            tool_calls.append(event["tool_call"])
 
             # Temp: Debug tool calling
             print(f"{BOLD}{FG_GOLD}{event['tool_call']}{RESET}")
-            print(tool_res["content"])
 
         sys.stdout.flush()
 
-    if message["content"] and not tool_call_pending:
-        messages.append(message)
+    content = "".join(parts)
+    if not tool_calls:
+        if content:
+            messages.append({"role": "assistant", "content": content})
+        return
+
+    # a single assistant message carries every call made during the turn
+    tool_calls.sort(key=lambda tool_call: tool_call["index"])
+    # dispatch before journaling so that Ctrl-C never leaves unanswered calls
+    tool_results = registry.dispatch_all(tool_calls)
+    messages.append(registry.request(tool_calls, content))
+    for tool_res in tool_results:
+        messages.append(tool_res)
+        print(tool_res["content"])
 
 
 def parse_args() -> Namespace:
@@ -197,6 +298,29 @@ def parse_args() -> Namespace:
         action="store_true",
         help="Output token-usage (default: False)",
     )
+    parser.add_argument(
+        "--context-policy",
+        default="drop-tools",
+        choices=CONTEXT_POLICIES.keys(),
+        help="Compaction applied when the prompt nears n_ctx (default: drop-tools)",
+    )
+    parser.add_argument(
+        "--context-reserve",
+        type=float,
+        default=0.25,
+        help="Fraction of n_ctx reserved for generation (default: 0.25)",
+    )
+    parser.add_argument(
+        "--keep-recent",
+        type=int,
+        default=8,
+        help="Messages always kept verbatim when compacting (default: 8)",
+    )
+    parser.add_argument(
+        "--summary-model",
+        default=None,
+        help="Model used by the summarize policy (default: the chat model)",
+    )
     return parser.parse_args()
 
 
@@ -248,15 +372,15 @@ if __name__ == "__main__":
     # set up the path to the current chat session
     messages_path = config.get_value("messages.path", DEFAULT_PATH_MSGS)
     if args.session:
-        messages_path = f"{messages_path}/{Path(args.session).stem}.json"
+        messages_path = f"{messages_path}/{Path(args.session).stem}.jsonl"
         print(f"session     -> {args.session}")
     else:
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        messages_path = f"{messages_path}/{timestamp}.json"
+        messages_path = f"{messages_path}/{timestamp}.jsonl"
         print(f"session     -> {timestamp}")
 
     # create the chat context
-    messages = JSONListTemplate(
+    messages = SessionJournal(
         messages_path,
         initial_data=[
             {
@@ -269,16 +393,35 @@ if __name__ == "__main__":
 
     # if chat context exists, load it, else create a new one
     try:
-        messages.load_json()
+        messages.load()
         print(f"loaded      -> {messages.file_path}\n")
-    except JSONFileErrorHandler:
-        messages.save_json()
+    except FileNotFoundError:
+        messages.create()
         print(f"created     -> {messages.file_path}\n")
 
     # create i/o context for user and model
     session = PromptSession(history=FileHistory(config.get_value("history.path")))
     registry = ToolRegistry()
     memory_initialize()
+    # merged or evicted memories must not be served from cached recalls
+    consolidator = MemoryConsolidator.from_config(
+        on_change=lambda: registry.cache and registry.cache.invalidate("forget", {})
+    )
+    consolidator.start()
+
+    # keep prompts within the model's context window
+    summary_model = args.summary_model or model
+    if summary_model != model:
+        router.load(summary_model)
+    context = ContextWindow(
+        LlamaCppTokenizer(request),
+        model,
+        max_seq_len,
+        policy=args.context_policy,
+        reserve=args.context_reserve,
+        keep_recent=args.keep_recent,
+        summarize=chat_summarizer(completion, summary_model),
+    )
 
     # output the chat context if it previously existed
     for message in messages.data:
@@ -309,11 +452,11 @@ if __name__ == "__main__":
                     auto_suggest=AutoSuggestFromHistory(),
                 )
                 messages.append({"role": "user", "content": user_input})
-                messages.save_json()
+                messages.sync()
 
-            run_agent(model, completion, messages, registry)
+            run_agent(model, completion, messages, registry, context)
             print()
-            messages.save_json()
+            messages.sync()
 
             if args.metrics:
                 prompt = completion.metrics(model)["prompt_tokens_total"]
@@ -330,21 +473,31 @@ if __name__ == "__main__":
                 print(f"  prompt tokens    +{dp}")
                 print(f"  generated tokens +{dg}")
                 print(f"  total: {prompt + generated}/{max_seq_len}")
+                print(f"  context: {context.total(messages.data)}/{context.budget}")
+                if registry.cache:
+                    for name, stat in registry.cache.stats().items():
+                        print(f"  cache {name}: {stat['hits']}/{stat['hits'] + stat['misses']} hits")
                 print()  # add padding
         except EOFError:  # Pop the last message
             print(f"\n{BOLD}Popped:{RESET}")
             last = messages.pop(messages.length - 1)
             print(last)
-            messages.save_json()
+            messages.sync()
 
         except KeyboardInterrupt:  # Exit the program
             print("\nQuit", end="")
+            messages.close()
+            consolidator.stop()
+            registry.close()
             router.unload(model)
             server.stop()
             exit(0)
 
         # Trap unhandled exceptions and output the traceback
         except Exception as e:
+            messages.close()
+            consolidator.stop()
+            registry.close()
             router.unload(model)
             server.stop()
             traceback.print_exception(e)
@@ -0,0 +1,247 @@
+# agent/cli/context.py
+"""
+Copyright © 2025 Austin Berrio
+
+Token-budget management for chat requests.
+
+`ContextWindow.fit()` returns the list of messages to send for the next request.
+The session itself is never modified; only the request is compacted. Token counts
+are computed once per message through the server's tokenizer and cached for the
+lifetime of the message object.
+
+Once the prompt exceeds the budget (`n_ctx` minus a reserve for generation), the
+selected policy is applied step by step until the prompt fits:
+
+- none:       send everything and let the server truncate.
+- recent:     keep the system prompt and the most recent messages.
+- drop-tools: elide the oldest tool outputs, then fall back to `recent`.
+- summarize:  elide tool outputs, fold older turns into a rolling summary, then
+              fall back to `recent`.
+
+Recent windows never begin with a `tool` message so that tool results are never
+separated from the assistant message that requested them.
+"""
+
+import json
+from logging import Logger
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent.config import config
+from agent.llama.client import LlamaCppCompletion, LlamaCppTokenizer
+
+Message = Dict[str, Any]
+Summarizer = Callable[[List[Message]], str]
+
+CONTEXT_POLICIES = {
+    "none": [],
+    "recent": ["recent"],
+    "drop-tools": ["drop_tools", "recent"],
+    "summarize": ["drop_tools", "summarize", "recent"],
+}
+
+# approximate per-message cost of the chat template (role markers, separators)
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for your own future reference. "
+    "Keep names, decisions, file paths, open tasks, and facts the user stated. "
+    "Be concise and do not add commentary."
+)
+
+# completion params that must not reach the summary request
+SUMMARY_EXCLUDED = ("tools", "tool_choice", "parallel_tool_calls", "messages", "stream")
+
+
+def chat_summarizer(completion: LlamaCppCompletion, model: str) -> Summarizer:
+    """Return a summarizer that asks `model` to condense a list of messages."""
+
+    def summarize(messages: List[Message]) -> str:
+        transcript = "\n\n".join(
+            f"{m.get('role')}: {ContextWindow.text(m)}" for m in messages
+        )
+        prompt = [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ]
+        # a plain request: with tools offered the model may answer with a call
+        params = {k: v for k, v in completion.params.items() if k not in SUMMARY_EXCLUDED}
+        params.update(model=model, messages=prompt, stream=False)
+        response = completion.request.post(endpoint="/v1/chat/completions", data=params)
+        return response["choices"][0]["message"].get("content") or ""
+
+    return summarize
+
+
+class ContextWindow:
+    def __init__(
+        self,
+        tokenizer: LlamaCppTokenizer,
+        model: str,
+        n_ctx: int,
+        policy: str = "drop-tools",
+        reserve: float = 0.25,
+        keep_recent: int = 8,
+        summarize: Optional[Summarizer] = None,
+    ):
+        if policy not in CONTEXT_POLICIES:
+            raise ValueError(f"Unknown context policy: {policy}")
+        if policy == "summarize" and summarize is None:
+            raise ValueError("The summarize policy requires a summarizer")
+
+        self.tokenizer = tokenizer
+        self.model = model
+        self.n_ctx = n_ctx
+        self.policy = policy
+        self.reserve = reserve
+        self.keep_recent = keep_recent
+        self.summarize = summarize
+
+        # id(message) -> (message, tokens). holding the message keeps its id unique.
+        self._counts: Dict[int, Tuple[Message, int]] = {}
+        # id(tool message) -> (message, elided copy)
+        self._elided: Dict[int, Tuple[Message, Message]] = {}
+        # (last summarized message, summary message)
+        self._summary: Optional[Tuple[Message, Message]] = None
+
+        cls_name = self.__class__.__name__
+        self.logger: Logger = config.get_logger("logger", cls_name)
+        self.logger.debug(f"Initialized {cls_name} instance.")
+
+    @property
+    def budget(self) -> int:
+        """Maximum number of prompt tokens."""
+        return int(self.n_ctx * (1.0 - self.reserve))
+
+    @staticmethod
+    def text(message: Message) -> str:
+        """Return the content and tool calls of a message as plain text."""
+        parts = [message.get("content") or ""]
+        for call in message.get("tool_calls") or []:
+            function = call.get("function", {})
+            parts.append(function.get("name", ""))
+            arguments = function.get("arguments", "")
+            parts.append(arguments if isinstance(arguments, str) else json.dumps(arguments))
+        return "\n".join(parts)
+
+    def count(self, message: Message) -> int:
+        """Return the cached token count for a message."""
+        key = id(message)
+        cached = self._counts.get(key)
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        text = f"{message.get('role', '')}\n{self.text(message)}"
+        tokens = len(self.tokenizer.encode(self.model, text))
+        tokens += MESSAGE_OVERHEAD
+        self._counts[key] = (message, tokens)
+        return tokens
+
+    def total(self, messages: List[Message]) -> int:
+        return sum(self.count(m) for m in messages)
+
+    def fit(self, messages: List[Message]) -> List[Message]:
+        """Return a view of `messages` that fits within the token budget."""
+        view = list(messages)
+        total = self.total(view)
+        for step in CONTEXT_POLICIES[self.policy]:
+            if total <= self.budget:
+                break
+            view = getattr(self, f"_{step}")(view)
+            new_total = self.total(view)
+            self.logger.debug(f"Context {step}: {total} -> {new_total} tokens")
+            total = new_total
+        self._prune(messages)
+        return view
+
+    # --- policies ---
+
+    def _split(self, view: List[Message], keep: int) -> int:
+        """Return the index where the recent window starts."""
+        split = max(1, len(view) - keep)
+        while split < len(view) - 1 and view[split].get("role") == "tool":
+            split += 1
+        return split
+
+    def _drop_tools(self, view: List[Message]) -> List[Message]:
+        split = self._split(view, self.keep_recent)
+        total = self.total(view)
+        for i in range(1, split):
+            if total <= self.budget:
+                break
+            message = view[i]
+            if message.get("role") != "tool":
+                continue
+            elided = self._elide(message)
+            total += self.count(elided) - self.count(message)
+            view[i] = elided
+        return view
+
+    def _summarize(self, view: List[Message]) -> List[Message]:
+        # replace messages that were already summarized with their summary
+        if self._summary:
+            last, summary = self._summary
+            for i, message in enumerate(view):
+                if self._original(message) is last:
+                    view = [view[0], summary] + view[i + 1 :]
+                    break
+            if self.total(view) <= self.budget:
+                return view
+
+        split = self._split(view, self.keep_recent)
+        if split <= 1:
+            return view
+
+        # fold the previous summary and older turns into a new summary
+        head = view[1:split]
+        text = self.summarize(head).strip()
+        if not text:
+            # keep the history; `recent` trims it instead of losing it to an empty summary
+            self.logger.warning("Context summarize: empty summary, falling back to recent")
+            return view
+        summary = {
+            "role": "user",
+            "content": f"Summary of the earlier conversation:\n{text}",
+        }
+        last = self._original(head[-1])
+        if self._summary and last is self._summary[1]:
+            last = self._summary[0]
+        self._summary = (last, summary)
+        return [view[0], summary] + view[split:]
+
+    def _recent(self, view: List[Message]) -> List[Message]:
+        keep = self.keep_recent
+        while True:
+            split = self._split(view, keep)
+            trimmed = [view[0]] + view[split:]
+            if keep <= 1 or self.total(trimmed) <= self.budget:
+                return trimmed
+            keep -= 1
+
+    # --- cache ---
+
+    def _elide(self, message: Message) -> Message:
+        cached = self._elided.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        elided = {k: v for k, v in message.items() if k != "content"}
+        elided["content"] = f"[elided {self.count(message)} tokens of tool output]"
+        self._elided[id(message)] = (message, elided)
+        return elided
+
+    def _original(self, message: Message) -> Message:
+        """Map an elided copy back onto the session message it replaced."""
+        if message.get("role") == "tool":
+            for original, elided in self._elided.values():
+                if elided is message:
+                    return original
+        return message
+
+    def _prune(self, messages: List[Message]) -> None:
+        """Forget cached entries for messages that left the session."""
+        if len(self._counts) <= 2 * len(messages) + 16:
+            return
+        live = {id(m) for m in messages}
+        live.update(id(copy) for _, copy in self._elided.values())
+        if self._summary:
+            live.add(id(self._summary[1]))
+        self._counts = {k: v for k, v in self._counts.items() if k in live}
+        self._elided = {k: v for k, v in self._elided.items() if k in live}
@@ -111,23 +111,38 @@ The module can expose the helper or any additional utilities.
 import argparse
 import os
 import sqlite3
-from typing import Generator
+from typing import Iterator, List, Optional, Tuple
 
 import numpy as np
 
 from agent.config import DEFAULT_PATH_STOR, config
-from agent.llama.api import LlamaCppAPI
+from agent.llama.client import LlamaCppEmbedding, LlamaCppTokenizer
 from agent.llama.requests import LlamaCppRequest
+from agent.tools.database import database_connect
+from agent.tools.vector import (
+    QUANTIZE_MODES,
+    IVFIndex,
+    QuantizedIndex,
+    VectorIndex,
+    from_blob,
+    normalize,
+    quantize,
+    to_blob,
+)
+
+EMBED_BATCH = 32  # chunks per embedding request
+LOAD_BATCH = 65536  # rows per fetch when building the index
 
 #
 # Embedding model
 #
 
 
-def embeddings(llama_api: LlamaCppAPI, text: str) -> np.ndarray:
-    response = llama_api.embeddings(text=text)
-    embedding = response["data"][0]["embedding"]
-    return np.asarray(embedding, dtype=np.float32)
+def embeddings(embedding: LlamaCppEmbedding, model: str, texts: List[str]) -> np.ndarray:
+    """Return one L2-normalised float32 vector (row) per text."""
+    response = embedding.create(model, texts)
+    data = sorted(response["data"], key=lambda item: item["index"])
+    return normalize([item["embedding"] for item in data])
 
 
 #
@@ -137,7 +152,7 @@ def embeddings(llama_api: LlamaCppAPI, text: str) -> np.ndarray:
 
 def token_chunk(
     token_ids: list[int], max_len: int = 32, overlap: int = 16
-) -> Generator:
+) -> Iterator[list[int]]:
     start = 0
     while start < len(token_ids):
         yield token_ids[start : start + max_len]
@@ -150,9 +165,32 @@ def token_chunk(
 
 DB_PATH = config.get_value("database.path", default=DEFAULT_PATH_STOR)
 
+RAG_INSERT = (
+    "INSERT INTO embeddings (doc_id, chunk_id, content, vector, qvector, qscale) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+# quantized codes of `vector`; qscale is NULL for binary codes
+RAG_COLUMNS = {"qvector": "BLOB", "qscale": "REAL"}
+
+
+def rag_config(key: str, default=None):
+    return (config.get_value("rag") or {}).get(key, default)
+
+
+def rag_quantize() -> Optional[str]:
+    """The configured quantization ("int8" or "binary"), or None for float32."""
+    mode = rag_config("quantize", "none")
+    return mode if mode in QUANTIZE_MODES else None
+
+
+def rag_index_path() -> str:
+    """The IVF partition is saved next to the database."""
+    return f"{os.path.splitext(DB_PATH)[0]}.ivf.npz"
+
 
 def rag_connect() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH)
+    return database_connect(DB_PATH)
 
 
 def rag_initialize() -> None:
@@ -169,42 +207,120 @@ def rag_initialize() -> None:
             )
             """
         )
-        conn.commit()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]
+        for name, definition in RAG_COLUMNS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE embeddings ADD COLUMN {name} {definition}")
 
 
-def rag_create(doc_id: str, chunk_id: int, content: str, vector: np.ndarray) -> None:
-    with rag_connect() as conn:
-        conn.execute(
-            """
-            INSERT INTO embeddings (doc_id, chunk_id, content, vector)
-            VALUES (?, ?, ?, ?)
-            """,
-            (doc_id, chunk_id, content, vector.tobytes()),
-        )
-        conn.commit()
-
+def rag_row(doc_id: str, chunk_id: int, content: str, vector: np.ndarray) -> tuple:
+    """Return the RAG_INSERT parameters, with codes if quantization is on."""
+    mode = rag_quantize()
+    if mode is None:
+        return doc_id, chunk_id, content, to_blob(vector), None, None
+    codes, scales = quantize(vector, mode)
+    scale = None if scales is None else float(scales[0])
+    return doc_id, chunk_id, content, to_blob(vector), codes[0].tobytes(), scale
 
-def rag_ingest(llama_api: LlamaCppAPI, path: str) -> None:
-    """Chunk, embed, then store."""
 
+def rag_create(doc_id: str, chunk_id: int, content: str, vector: np.ndarray) -> int:
+    with rag_connect() as conn:
+        cur = conn.execute(RAG_INSERT, rag_row(doc_id, chunk_id, content, vector))
+    return cur.lastrowid
+
+
+def rag_ingest(
+    tokenizer: LlamaCppTokenizer,
+    embedding: LlamaCppEmbedding,
+    model: str,
+    path: str,
+    index: Optional["RagIndex"] = None,
+) -> int:
+    """Chunk, embed, then store. Returns the number of chunks."""
     with open(path) as file:
         text = file.read()
-        token_ids = llama_api.tokenize(text, add_special=False)
-
-        for i, chunk in enumerate(token_chunk(token_ids)):
-            chunk_text = llama_api.detokenize(chunk)
-            vector = embeddings(llama_api, chunk_text)
-            rag_create(path, i, chunk_text, vector)
-
-
-def rag_load() -> Generator:
-    with rag_connect() as conn:
-        rows = conn.execute(
-            "SELECT doc_id, chunk_id, content, vector FROM embeddings"
-        ).fetchall()
-        for doc_id, chunk_id, content, blob in rows:
-            vector = np.frombuffer(blob, dtype=np.float32)
-            yield (doc_id, chunk_id, content, vector)
+    token_ids = tokenizer.encode(model, text)
+    chunks = [tokenizer.decode(model, chunk) for chunk in token_chunk(token_ids)]
+
+    for start in range(0, len(chunks), EMBED_BATCH):
+        batch = chunks[start : start + EMBED_BATCH]
+        vectors = embeddings(embedding, model, batch)
+        with rag_connect() as conn:  # one transaction per batch
+            ids = [
+                conn.execute(RAG_INSERT, rag_row(path, start + i, content, vector)).lastrowid
+                for i, (content, vector) in enumerate(zip(batch, vectors))
+            ]
+        if index is not None:
+            index.add(ids, vectors)
+    return len(chunks)
+
+
+def rag_dim() -> Optional[int]:
+    """Dimensions of the stored vectors; chunks from another model are skipped."""
+    first = rag_connect().execute("SELECT length(vector) FROM embeddings LIMIT 1").fetchone()
+    return None if first is None else first[0] // 4
+
+
+def rag_vectors(batch: int = LOAD_BATCH) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield (ids, vectors) of the stored chunks in blocks of `batch` rows."""
+    dim = rag_dim()
+    if dim is None:
+        return
+    size = dim * 4
+    cur = rag_connect().execute(
+        "SELECT id, vector FROM embeddings WHERE length(vector) = ? ORDER BY id", (size,)
+    )
+    while rows := cur.fetchmany(batch):
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        blob = b"".join(row[1] for row in rows)
+        yield ids, np.frombuffer(blob, dtype=np.float32).reshape(len(rows), dim)
+
+
+def rag_codes(
+    mode: str, batch: int = LOAD_BATCH
+) -> Iterator[Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]]:
+    """Yield (ids, codes, scales) of the stored chunks in blocks of `batch` rows.
+
+    Chunks without codes in `mode` (stored before quantization was enabled, or
+    in the other mode) are quantized from their float vectors, and their codes
+    are written back once every block has been read.
+    """
+    dim = rag_dim()
+    if dim is None:
+        return
+    int8 = mode == "int8"
+    width = dim if int8 else -(-dim // 8)
+    dtype = np.int8 if int8 else np.uint8
+    current = "qscale IS NOT NULL" if int8 else "qscale IS NULL"
+    conn = rag_connect()
+    # the float vector is only read for rows that have to be quantized
+    cur = conn.execute(
+        "SELECT id, qvector, qscale, "
+        f"CASE WHEN length(qvector) = ? AND {current} THEN NULL ELSE vector END "
+        "FROM embeddings WHERE length(vector) = ? ORDER BY id",
+        (width, dim * 4),
+    )
+    updates = []
+    while rows := cur.fetchmany(batch):
+        fresh = [row for row in rows if row[3] is None]
+        if fresh:
+            ids = np.fromiter((row[0] for row in fresh), dtype=np.int64, count=len(fresh))
+            codes = np.frombuffer(b"".join(row[1] for row in fresh), dtype=dtype)
+            scales = np.array([row[2] for row in fresh], dtype=np.float32) if int8 else None
+            yield ids, codes.reshape(len(fresh), width), scales
+        stale = [row for row in rows if row[3] is not None]
+        if stale:
+            ids = np.fromiter((row[0] for row in stale), dtype=np.int64, count=len(stale))
+            blob = b"".join(row[3] for row in stale)
+            codes, scales = quantize(np.frombuffer(blob, dtype=np.float32).reshape(-1, dim), mode)
+            updates.extend(
+                (code.tobytes(), None if scales is None else float(scales[i]), int(ids[i]))
+                for i, code in enumerate(codes)
+            )
+            yield ids, codes, scales
+    if updates:
+        with conn:
+            conn.executemany("UPDATE embeddings SET qvector = ?, qscale = ? WHERE id = ?", updates)
 
 
 #
@@ -212,21 +328,110 @@ def rag_load() -> Generator:
 #
 
 
-def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    """cosine similarity"""
-    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-
-
-def search(llama_api: LlamaCppAPI, query: str, top_k: int = 5) -> list[tuple]:
-    scores = []
-    q_vec = embeddings(llama_api, query)
+class RagIndex:
+    """The stored chunk vectors, built once and updated on ingest.
+
+    Stores with at least `rag.min_chunks` chunks are searched approximately
+    through an `IVFIndex`; its partition is trained once, saved next to the
+    database and retrained when the store has grown by `rag.retrain`.
+
+    With `rag.quantize` set, only int8 or binary codes are kept in memory
+    (`QuantizedIndex`) and the best `top_k * rag.oversample` candidates are
+    re-scored with their float vectors from the database. The IVF partition
+    needs the float vectors and is not used then.
+    """
+
+    def __init__(self, nprobe: Optional[int] = None, quantize: Optional[str] = None):
+        mode = quantize or rag_quantize()
+        self.vectors = QuantizedIndex(mode) if mode else VectorIndex()
+        self.ivf: Optional[IVFIndex] = None
+        self.nprobe = nprobe or rag_config("nprobe", 8)
+        self.oversample = rag_config("oversample", 4)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def quantized(self) -> bool:
+        return isinstance(self.vectors, QuantizedIndex)
+
+    def load(self) -> "RagIndex":
+        if self.quantized:
+            self.vectors.dim = rag_dim()
+            for ids, codes, scales in rag_codes(self.vectors.mode):
+                self.vectors.add_codes(ids, codes, scales)
+            return self
+        for ids, vectors in rag_vectors():
+            self.vectors.add_many(ids, vectors)
+        self.partition()
+        return self
+
+    def add(self, ids: List[int], vectors: np.ndarray) -> None:
+        self.vectors.add_many(ids, vectors)
+
+    def partition(self) -> Optional[IVFIndex]:
+        """Load, train or retrain the IVF partition if the store is large enough."""
+        if (
+            self.quantized
+            or rag_config("index", "ivf") != "ivf"
+            or len(self) < rag_config("min_chunks", 100000)
+        ):
+            self.ivf = None
+            return None
+        path = rag_index_path()
+        if self.ivf is None:
+            self.ivf = IVFIndex.load(path, self.vectors, self.nprobe)
+        if self.ivf is None or len(self) > self.ivf.trained * rag_config("retrain", 2.0):
+            self.ivf = IVFIndex.train(self.vectors, rag_config("nlist", 0), self.nprobe)
+        if self.ivf.saved != len(self):
+            self.ivf.save(path)
+        return self.ivf
+
+    def search(self, vector: np.ndarray, top_k: int = 5) -> list[tuple]:
+        """Return (score, doc_id, chunk_id, content) for the top_k closest chunks."""
+        if self.quantized:
+            return self._rescore(vector, self.vectors.search(vector, top_k * self.oversample), top_k)
+        if self.ivf is not None:
+            hits = self.ivf.search(vector, top_k, self.nprobe)
+        else:
+            hits = self.vectors.search(vector, top_k)
+        if not hits:
+            return []
+        ids = [key for key, _ in hits]
+        rows = rag_connect().execute(
+            "SELECT id, doc_id, chunk_id, content FROM embeddings "
+            f"WHERE id IN ({', '.join('?' * len(ids))})",
+            ids,
+        ).fetchall()
+        found = {row[0]: row[1:] for row in rows}
+        return [(score, *found[key]) for key, score in hits if key in found]
+
+    def _rescore(self, vector: np.ndarray, candidates: list, top_k: int) -> list[tuple]:
+        """Rank quantized candidates by the cosine similarity of their float vectors."""
+        if not candidates:
+            return []
+        ids = [key for key, _ in candidates]
+        rows = rag_connect().execute(
+            "SELECT doc_id, chunk_id, content, vector FROM embeddings "
+            f"WHERE id IN ({', '.join('?' * len(ids))})",
+            ids,
+        ).fetchall()
+        if not rows:
+            return []
+        scores = normalize([from_blob(row[3]) for row in rows]) @ normalize(vector)
+        best = np.argsort(-scores, kind="stable")[:top_k]
+        return [(float(scores[i]), *rows[i][:3]) for i in best]
 
-    for doc_id, chunk_id, content, vector in rag_load():
-        score = cosine(q_vec, vector)
-        scores.append((score, doc_id, chunk_id, content))
 
-    scores.sort(reverse=True, key=lambda x: x[0])
-    return scores[:top_k]
+def search(
+    index: RagIndex,
+    embedding: LlamaCppEmbedding,
+    model: str,
+    query: str,
+    top_k: int = 5,
+) -> list[tuple]:
+    vector = embeddings(embedding, model, [query])[0]
+    return index.search(vector, top_k)
 
 
 if __name__ == "__main__":
@@ -234,21 +439,24 @@ if __name__ == "__main__":
     parser.add_argument("query", type=str)
     parser.add_argument("--file", type=str, required=False)
     parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists to search")
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES, default=None)
     parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default=config.get_value("model.embed"))
     args = parser.parse_args()
 
-    llama_api = LlamaCppAPI(
-        llama_request=LlamaCppRequest(port=args.port),
-        stream=False,
-        cache_prompt=False,
-    )
+    request = LlamaCppRequest(port=str(args.port))
+    tokenizer = LlamaCppTokenizer(request)
+    embedding = LlamaCppEmbedding(request)
 
     rag_initialize()
+    index = RagIndex(args.nprobe, args.quantize).load()
 
     if args.file:
-        rag_ingest(llama_api, args.file)
+        rag_ingest(tokenizer, embedding, args.model, args.file, index)
+        index.partition()  # persist the lists of the new chunks
 
-    results = search(llama_api, args.query, args.top_k)
+    results = search(index, embedding, args.model, args.query, args.top_k)
 
     for score, doc_id, idx, content in results:
         print(f"{score:.3f} | {doc_id} [{idx}]:\n{content}\n")
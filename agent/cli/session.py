@@ -0,0 +1,266 @@
+# agent/cli/session.py
+"""
+Copyright © 2025 Austin Berrio
+
+Append-only chat session journal.
+
+Each message is appended to a JSON Lines file as it arrives instead of rewriting
+the whole session after every turn, so persistence costs O(message size) rather
+than O(session size).
+
+Journal format:
+    - A line without an `op` key is a message appended to the session.
+    - `{"op": "pop", "index": n}` removes the message at index `n`.
+
+Writes are flushed to the OS on every `sync()` and fsync'd in batches (every
+`sync_every` records or `sync_interval` seconds, whichever comes first). Once
+the journal holds `compact_ratio` times more records than live messages, a
+background thread rewrites it to a temporary file and atomically swaps it in.
+
+Sessions are loaded lazily: `load()` only validates the file exists, and the
+journal is replayed the first time `data` is accessed. Legacy `.json` sessions
+written by `JSONListTemplate` are imported transparently.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union
+
+Message = Dict[str, Any]
+
+
+class SessionJournal:
+    def __init__(
+        self,
+        file_path: Union[str, Path],
+        initial_data: Optional[List[Message]] = None,
+        sync_every: int = 8,
+        sync_interval: float = 1.0,
+        compact_ratio: float = 2.0,
+    ):
+        self._file_path = Path(file_path)
+        self._initial = deepcopy(initial_data) if initial_data else []
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        self._compact_ratio = compact_ratio
+
+        self._lock = threading.RLock()
+        self._data: Optional[List[Message]] = None  # None until replayed
+        self._file: Optional[TextIO] = None
+        self._records = 0  # records in the journal file
+        self._pending = 0  # records written since the last fsync
+        self._synced = time.monotonic()
+        self._tail: Optional[List[str]] = None  # records written while compacting
+        self._compactor: Optional[threading.Thread] = None
+
+    @property
+    def file_path(self) -> Path:
+        return self._file_path
+
+    @property
+    def legacy_path(self) -> Path:
+        """Path of a session saved by `JSONListTemplate`."""
+        return self._file_path.with_suffix(".json")
+
+    @property
+    def data(self) -> List[Message]:
+        """Return the live message list (replays the journal on first access).
+
+        NOTE: The list is not copied. Treat it as read-only and use `append()` and
+        `pop()` to modify the session so that changes reach the journal.
+        """
+        with self._lock:
+            if self._data is None:
+                self._replay()
+            return self._data
+
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+    def mkdir(self) -> None:
+        """Create the parent directory for the journal."""
+        self._file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def exists(self) -> bool:
+        return self._file_path.exists() or self.legacy_path.exists()
+
+    def load(self) -> None:
+        """Select an existing session. Messages are read on first access."""
+        if not self.exists():
+            raise FileNotFoundError(f"No such session: {self._file_path}")
+        with self._lock:
+            self._data = None
+
+    def create(self) -> None:
+        """Start a fresh session seeded with the initial messages."""
+        with self._lock:
+            self._close()
+            self._data = deepcopy(self._initial)
+            self._rewrite(self._data)
+
+    def append(self, message: Message) -> None:
+        with self._lock:
+            self.data.append(message)
+            self._write(message)
+
+    def pop(self, index: int) -> Optional[Message]:
+        with self._lock:
+            if index < 0 or index >= self.length:
+                return None
+            message = self.data.pop(index)
+            self._write({"op": "pop", "index": index})
+            return message
+
+    def sync(self, force: bool = False) -> None:
+        """Flush pending records and fsync once the batch thresholds are met."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            elapsed = time.monotonic() - self._synced
+            if force or self._pending >= self._sync_every or elapsed >= self._sync_interval:
+                os.fsync(self._file.fileno())
+                self._pending = 0
+                self._synced = time.monotonic()
+            if self._should_compact():
+                self.compact()
+
+    def compact(self, background: bool = True) -> None:
+        """Rewrite the journal so that it only contains live messages."""
+        with self._lock:
+            if self._compactor and self._compactor.is_alive():
+                return
+            self._tail = []
+            snapshot = list(self.data)
+        if not background:
+            return self._compact(snapshot)
+        self._compactor = threading.Thread(
+            target=self._compact, args=(snapshot,), daemon=True
+        )
+        self._compactor.start()
+
+    def close(self) -> None:
+        """Sync outstanding records and release the journal file."""
+        if self._compactor:
+            self._compactor.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._close()
+
+    # --- internal ---
+
+    def _handle(self) -> TextIO:
+        if self._file is None:
+            self._file = open(self._file_path, "a", encoding="utf-8")
+        return self._file
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _encode(self, record: Dict[str, Any]) -> str:
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = self._encode(record)
+        self._handle().write(line)
+        if self._tail is not None:
+            self._tail.append(line)
+        self._records += 1
+        self._pending += 1
+
+    def _replay(self) -> None:
+        """Rebuild the message list from the journal (or a legacy session)."""
+        if not self._file_path.exists() and self.legacy_path.exists():
+            with open(self.legacy_path, "r", encoding="utf-8") as file:
+                self._data = json.load(file) or []
+            self._rewrite(self._data)
+            return
+
+        data: List[Message] = []
+        records = 0
+        torn = False
+        with open(self._file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    torn = True  # partial write from an interrupted session
+                    break
+                records += 1
+                if record.get("op") == "pop":
+                    if 0 <= record["index"] < len(data):
+                        del data[record["index"]]
+                else:
+                    data.append(record)
+
+        self._data = data
+        self._records = records
+        if torn:  # drop the partial record before appending after it
+            self._rewrite(data)
+        elif self._should_compact():
+            self.compact()
+
+    def _temp(self) -> Tuple[int, str]:
+        """Open a private temporary file next to the journal."""
+        return tempfile.mkstemp(
+            dir=self._file_path.parent, prefix=f".{self._file_path.name}.", suffix=".tmp"
+        )
+
+    def _rewrite(self, messages: List[Message]) -> None:
+        """Atomically replace the journal with `messages`."""
+        fd, tmp = self._temp()
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.writelines(self._encode(m) for m in messages)
+                file.flush()
+                os.fsync(file.fileno())
+            self._close()
+            os.replace(tmp, self._file_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._records = len(messages)
+        self._pending = 0
+        self._tail = None  # a running compaction snapshot is now stale
+
+    def _compact(self, snapshot: List[Message]) -> None:
+        fd, tmp = self._temp()
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.writelines(self._encode(m) for m in snapshot)
+                file.flush()
+                os.fsync(file.fileno())
+
+            # replay records that arrived while the snapshot was being written
+            with self._lock:
+                if self._tail is None:
+                    return  # the journal was rewritten meanwhile
+                tail = self._tail
+                with open(tmp, "a", encoding="utf-8") as file:
+                    file.writelines(tail)
+                    file.flush()
+                    os.fsync(file.fileno())
+                self._close()
+                os.replace(tmp, self._file_path)
+                self._records = len(snapshot) + len(tail)
+                self._pending = 0
+        finally:
+            with self._lock:
+                self._tail = None
+            if os.path.exists(tmp):  # not swapped in
+                os.unlink(tmp)
+
+    def _should_compact(self) -> bool:
+        live = len(self._data) if self._data is not None else 0
+        stale = self._records - live
+        return stale >= 16 and self._records > self._compact_ratio * live
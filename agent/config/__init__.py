@@ -40,6 +40,7 @@ DEFAULT_PATH_CONF = f"{DEFAULT_PATH_CACH}/settings.json"
 DEFAULT_PATH_LOGS = f"{DEFAULT_PATH_CACH}/data.log"
 DEFAULT_PATH_HIST = f"{DEFAULT_PATH_CACH}/history.log"
 DEFAULT_PATH_STOR = f"{DEFAULT_PATH_CACH}/storage.sqlite3"
+DEFAULT_PATH_SPIL = f"{DEFAULT_PATH_CACH}/spill"
 
 DEFAULT_CONF = {
     "logger": {
@@ -54,6 +55,9 @@ DEFAULT_CONF = {
     "database": {
         "path": DEFAULT_PATH_STOR,
         "type": "file",
+        "mmap_size": 256 * 1024**2,
+        "cache_size": -16384,  # KiB
+        "busy_timeout": 5000,  # ms
     },
     "messages": {
         "path": DEFAULT_PATH_MSGS,
@@ -67,6 +71,14 @@ DEFAULT_CONF = {
         "shell": "/usr/bin/bash",
         "executable": False,
         "restricted": False,
+        "persistent": False,
+        "stream": False,
+        "timeout": 30.0,
+        "limits": {
+            "cpu": 60,
+            "memory": 4 * 1024**3,
+            "file_size": 1024**3,
+        },
         "command_names": [
             "date",
             "ls",
@@ -82,6 +94,45 @@ DEFAULT_CONF = {
             "git",
         ],
     },
+    "output": {
+        "max_bytes": 16384,
+        "head_ratio": 0.5,
+        "spill": DEFAULT_PATH_SPIL,
+    },
+    "cache": {
+        "enabled": True,
+        "max_entries": 256,
+        "weather_ttl": 600.0,
+        "shell_ttl": 5.0,
+    },
+    "trace": {
+        "enabled": True,
+        "flush_every": 64,
+        "flush_interval": 5.0,
+    },
+    "memory": {
+        "semantic": True,
+        "recall_threshold": 0.3,
+        "match_threshold": 0.85,
+        "forget_threshold": 0.6,
+        "retry_interval": 60.0,
+        "consolidate": True,
+        "consolidate_interval": 300.0,
+        "consolidate_batch": 256,
+        "merge_threshold": 0.92,
+        "minhash_threshold": 0.8,
+        "max_memories": 10000,
+        "half_life": 30.0,  # days
+    },
+    "rag": {
+        "index": "ivf",  # or "flat" for exact search only
+        "min_chunks": 100000,  # exact search below this many chunks
+        "nlist": 0,  # 0 picks sqrt(chunks)
+        "nprobe": 8,
+        "retrain": 2.0,  # retrain once the store grows by this factor
+        "quantize": "none",  # "int8" or "binary" codes in memory
+        "oversample": 4,  # quantized candidates re-scored per result
+    },
     "model": {
         "chat": "gpt-oss-20b-f16",
         "embed": "qwen3-embedding-0.6b-f16",
@@ -119,7 +119,7 @@ class LlamaCppEmbedding(LlamaCppBase):
         self.logger.debug(f"Fetching embedding for input: {input}")
         endpoint = "/v1/embeddings"
         data = {
-            "model": self.model,
+            "model": model,
             "input": input,
             "encoding_format": "float",
         }
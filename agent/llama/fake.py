@@ -0,0 +1,462 @@
+# agent/llama/fake.py
+"""
+Copyright © 2025 Austin Berrio
+Local stand-in for llama-server.
+
+The fake server speaks just enough of the llama-server REST API for the client,
+router, CLI loop, and RAG pipeline to run without a real binary or model weights.
+Everything is deterministic: tokens are whitespace-delimited pieces, embeddings
+are seeded from a hash of their input, and chat completions either echo a canned
+reply or replay recorded turns.
+
+Supported endpoints:
+    GET  /health, /models, /props, /metrics
+    POST /models/load, /models/unload, /tokenize, /detokenize
+    POST /v1/embeddings, /v1/chat/completions (SSE when `stream` is set)
+
+Latency knobs:
+    latency           - fixed delay in seconds added to every request.
+    prefill_rate      - prompt tokens processed per second (0 disables).
+    decode_rate       - tokens generated per second (0 disables).
+
+Replay files are JSONL where each line is one assistant turn encoded as a list of
+`delta` objects, e.g. `[{"content": "Hello"}, {"content": ", world!"}]`. Turns are
+replayed in order and wrap around once exhausted.
+
+The fake can stand in for the binary through `LlamaCppServer.start(args)`:
+
+>>> server.start([sys.executable, "-m", "agent.llama.fake", "--port", "8080"])
+"""
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import Logger
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import regex as re
+
+from agent.config import config
+
+FAKE_REPLY = "This is a reply from the fake llama-server."
+FAKE_PIECES = re.compile(r"\s*\S+|\s+")
+
+
+def fake_chunks(
+    deltas: List[Dict[str, Any]],
+    model: str = "fake",
+    created: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Wrap `delta` objects into OpenAI-compatible chat completion chunks."""
+    created = int(time.time()) if created is None else created
+    for delta in deltas:
+        yield {
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+    yield {
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    }
+
+
+def fake_replay(path: str) -> List[List[Dict[str, Any]]]:
+    """Load recorded assistant turns from a JSONL file."""
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class LlamaCppFakeState:
+    """Shared, thread-safe state backing the fake endpoints."""
+
+    def __init__(
+        self,
+        models: List[str],
+        n_ctx: int = 8192,
+        n_embd: int = 256,
+        latency: float = 0.0,
+        prefill_rate: float = 0.0,
+        decode_rate: float = 0.0,
+        replay: Optional[List[List[Dict[str, Any]]]] = None,
+    ):
+        self.lock = threading.Lock()
+        self.models = {model: "unloaded" for model in models}
+        self.n_ctx = n_ctx
+        self.n_embd = n_embd
+        self.latency = latency
+        self.prefill_rate = prefill_rate
+        self.decode_rate = decode_rate
+        self.replay = replay or []
+        self.turn = 0
+        self.vocab: Dict[str, int] = {}
+        self.pieces: List[str] = []
+        self.prompt_tokens_total = 0
+        self.tokens_predicted_total = 0
+        self.requests_total = 0
+
+    def encode(self, text: str) -> List[int]:
+        """Map text onto stable token ids, growing the vocabulary on demand."""
+        tokens = []
+        with self.lock:
+            for piece in FAKE_PIECES.findall(text):
+                if piece not in self.vocab:
+                    self.vocab[piece] = len(self.pieces)
+                    self.pieces.append(piece)
+                tokens.append(self.vocab[piece])
+        return tokens
+
+    def decode(self, tokens: List[int]) -> str:
+        with self.lock:
+            return "".join(self.pieces[t] for t in tokens if 0 <= t < len(self.pieces))
+
+    def embed(self, text: str) -> List[float]:
+        """Return a deterministic, L2-normalised vector for `text`."""
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.n_embd)]
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def next_turn(self, prompt: str) -> List[Dict[str, Any]]:
+        """Return the deltas for the next assistant turn."""
+        with self.lock:
+            if self.replay:
+                deltas = self.replay[self.turn % len(self.replay)]
+                self.turn += 1
+                return deltas
+        return [{"content": piece} for piece in FAKE_PIECES.findall(FAKE_REPLY)]
+
+    def count(self, prompt: int = 0, predicted: int = 0) -> None:
+        with self.lock:
+            self.prompt_tokens_total += prompt
+            self.tokens_predicted_total += predicted
+
+    def prefill(self, n_tokens: int) -> None:
+        """Simulate prompt processing time."""
+        if self.prefill_rate > 0:
+            time.sleep(n_tokens / self.prefill_rate)
+
+    def decode_step(self) -> None:
+        """Simulate the time spent generating a single token."""
+        if self.decode_rate > 0:
+            time.sleep(1.0 / self.decode_rate)
+
+
+class LlamaCppFakeHandler(BaseHTTPRequestHandler):
+    """Route requests onto `LlamaCppFakeState`."""
+
+    server_version = "llama-fake/0.1"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> LlamaCppFakeState:
+        return self.server.state
+
+    def log_message(self, format: str, *args: Any) -> None:
+        self.server.logger.debug(format % args)
+
+    # --- helpers ---
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _send(self, status: int, body: Any, content_type: str = "application/json"):
+        data = body if isinstance(body, str) else json.dumps(body)
+        payload = data.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, message: str, type: str) -> None:
+        self._send(status, {"error": {"code": status, "message": message, "type": type}})
+
+    def _model(self, body: Dict[str, Any], query: Dict[str, List[str]]) -> Optional[str]:
+        model = body.get("model") or query.get("model", [None])[0]
+        if model is None and len(self.state.models) == 1:
+            model = next(iter(self.state.models))
+        return model
+
+    def _prompt(self, messages: List[Dict[str, Any]]) -> str:
+        parts = []
+        for message in messages:
+            parts.append(message.get("role", ""))
+            parts.append(message.get("content") or "")
+            for call in message.get("tool_calls") or []:
+                parts.append(call["function"].get("arguments", ""))
+        return "\n".join(parts)
+
+    # --- verbs ---
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self._delay()
+
+        if url.path == "/health":
+            return self._send(200, {"status": "ok"})
+        if url.path in ("/models", "/v1/models"):
+            return self._send(200, {"object": "list", "data": self._models()})
+        if url.path == "/props":
+            return self._props(self._model({}, query))
+        if url.path == "/metrics":
+            return self._send(200, self._metrics(), "text/plain; version=0.0.4")
+        return self._error(404, f"File Not Found: {url.path}", "not_found_error")
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        body = self._body()
+        self._delay()
+
+        if url.path == "/models/load":
+            return self._route(body.get("model"), "loaded")
+        if url.path == "/models/unload":
+            return self._route(body.get("model"), "unloaded")
+        if url.path == "/tokenize":
+            return self._tokenize(body)
+        if url.path == "/detokenize":
+            return self._send(200, {"content": self.state.decode(body.get("tokens", []))})
+        if url.path in ("/embeddings", "/v1/embeddings"):
+            return self._embeddings(body)
+        if url.path in ("/chat/completions", "/v1/chat/completions"):
+            return self._chat(body)
+        return self._error(404, f"File Not Found: {url.path}", "not_found_error")
+
+    # --- endpoints ---
+
+    def _delay(self) -> None:
+        with self.state.lock:
+            self.state.requests_total += 1
+        if self.state.latency > 0:
+            time.sleep(self.state.latency)
+
+    def _models(self) -> List[Dict[str, Any]]:
+        with self.state.lock:
+            return [
+                {
+                    "id": model,
+                    "object": "model",
+                    "owned_by": "llamacpp",
+                    "status": {"value": status, "args": [], "preset": f"[{model}]\n"},
+                }
+                for model, status in self.state.models.items()
+            ]
+
+    def _route(self, model: Optional[str], status: str) -> None:
+        with self.state.lock:
+            if model not in self.state.models:
+                return self._error(400, f"model '{model}' not found", "invalid_request_error")
+            self.state.models[model] = status
+        self._send(200, {"success": True})
+
+    def _props(self, model: Optional[str]) -> None:
+        if model not in self.state.models:
+            return self._error(400, f"model '{model}' not found", "invalid_request_error")
+        self._send(
+            200,
+            {
+                "model_alias": model,
+                "model_path": f"models/{model}.gguf",
+                "chat_template": "",
+                "default_generation_settings": {"n_ctx": self.state.n_ctx},
+                "endpoint_slots": True,
+                "endpoint_props": True,
+                "endpoint_metrics": True,
+                "is_sleeping": self.state.models[model] != "loaded",
+            },
+        )
+
+    def _metrics(self) -> str:
+        with self.state.lock:
+            lines = [
+                "# HELP llamacpp:prompt_tokens_total Number of prompt tokens processed.",
+                "# TYPE llamacpp:prompt_tokens_total counter",
+                f"llamacpp:prompt_tokens_total {self.state.prompt_tokens_total}",
+                "# HELP llamacpp:tokens_predicted_total Number of generation tokens processed.",
+                "# TYPE llamacpp:tokens_predicted_total counter",
+                f"llamacpp:tokens_predicted_total {self.state.tokens_predicted_total}",
+                "# HELP llamacpp:requests_processing Number of requests processed.",
+                "# TYPE llamacpp:requests_processing gauge",
+                f"llamacpp:requests_processing {self.state.requests_total}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def _tokenize(self, body: Dict[str, Any]) -> None:
+        content = body.get("content", "")
+        if isinstance(content, list):
+            content = "".join(content)
+        tokens = self.state.encode(content)
+        if body.get("with_pieces"):
+            pieces = [{"id": t, "piece": self.state.decode([t])} for t in tokens]
+            return self._send(200, {"tokens": pieces})
+        self._send(200, {"tokens": tokens})
+
+    def _embeddings(self, body: Dict[str, Any]) -> None:
+        inputs = body.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+        n_tokens = sum(len(self.state.encode(text)) for text in inputs)
+        self.state.prefill(n_tokens)
+        self.state.count(prompt=n_tokens)
+        self._send(
+            200,
+            {
+                "object": "list",
+                "model": body.get("model"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": self.state.embed(text)}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": n_tokens, "total_tokens": n_tokens},
+            },
+        )
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        model = body.get("model", "fake")
+        prompt = self._prompt(body.get("messages", []))
+        n_prompt = len(self.state.encode(prompt))
+        self.state.prefill(n_prompt)
+        deltas = self.state.next_turn(prompt)
+        self.state.count(prompt=n_prompt, predicted=len(deltas))
+
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": ""}
+            for delta in deltas:
+                message["content"] += delta.get("content") or ""
+                if delta.get("tool_calls"):
+                    message.setdefault("tool_calls", []).extend(delta["tool_calls"])
+            return self._send(
+                200,
+                {
+                    "object": "chat.completion",
+                    "model": model,
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": n_prompt, "completion_tokens": len(deltas)},
+                },
+            )
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for chunk in fake_chunks(deltas, model):
+            self.state.decode_step()
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class LlamaCppFakeServer:
+    """Run `LlamaCppFakeHandler` on a background thread."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        models: Optional[List[str]] = None,
+        **kwargs: Any,
+    ):
+        self.state = LlamaCppFakeState(models or ["fake"], **kwargs)
+        self.httpd = ThreadingHTTPServer((host, int(port)), LlamaCppFakeHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread: Optional[threading.Thread] = None
+
+        cls_name = self.__class__.__name__
+        self.logger: Logger = config.get_logger("logger", cls_name)
+        self.httpd.logger = self.logger
+        self.logger.debug(f"Initialized {cls_name} instance.")
+
+    @property
+    def host(self) -> str:
+        return self.httpd.server_address[0]
+
+    @property
+    def port(self) -> str:
+        # the request singleton expects the port as a string
+        return str(self.httpd.server_address[1])
+
+    def start(self) -> None:
+        """Serve requests on a daemon thread."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info(f"Fake llama-server listening on {self.host}:{self.port}")
+
+    def stop(self) -> None:
+        """Shut the server down and release the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.logger.info("Fake llama-server stopped")
+
+    def __enter__(self) -> "LlamaCppFakeServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+# usage example
+# the fake accepts the same --host and --port flags as llama-server so that it can be
+# dropped in wherever the binary is expected. model ids are derived from file stems.
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Serve a fake llama-server for offline testing.")
+    parser.add_argument("--host", default="127.0.0.1", help="Host (default: 127.0.0.1)")
+    parser.add_argument("--port", default="8080", help="Port (default: 8080)")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["fake"],
+        help="Model paths or ids to register (default: fake)",
+    )
+    parser.add_argument("--models-dir", default=None, help="Register *.gguf stems")
+    parser.add_argument("--ctx-size", type=int, default=8192, help="Reported n_ctx")
+    parser.add_argument("--n-embd", type=int, default=256, help="Embedding dimensions")
+    parser.add_argument("--latency", type=float, default=0.0, help="Per request delay (s)")
+    parser.add_argument("--prefill-rate", type=float, default=0.0, help="Prompt tokens/s")
+    parser.add_argument("--decode-rate", type=float, default=0.0, help="Generated tokens/s")
+    parser.add_argument("--replay", default=None, help="JSONL file of recorded turns")
+    args, _ = parser.parse_known_args()  # ignore llama-server flags we do not model
+
+    models = [Path(model).stem for model in args.models]
+    if args.models_dir and Path(args.models_dir).is_dir():
+        models = sorted(p.stem for p in Path(args.models_dir).rglob("*.gguf")) or models
+
+    server = LlamaCppFakeServer(
+        host=args.host,
+        port=args.port,
+        models=models,
+        n_ctx=args.ctx_size,
+        n_embd=args.n_embd,
+        latency=args.latency,
+        prefill_rate=args.prefill_rate,
+        decode_rate=args.decode_rate,
+        replay=fake_replay(args.replay) if args.replay else None,
+    )
+
+    print(f"Serving {list(server.state.models)} on {server.host}:{server.port}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
@@ -140,6 +140,61 @@ _file = [
             "strict": True,
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "patch",
+            "description": "Applies a unified diff to a file. Hunks are located by their context lines, so line numbers may be approximate. Nothing is written unless every hunk applies. Prefer this over `write` for small changes to large files.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "filepath": {
+                        "type": "string",
+                        "description": "The path of the file to patch.",
+                    },
+                    "diff": {
+                        "type": "string",
+                        "description": "Unified diff hunks (`@@ -start,count +start,count @@` followed by ' ', '-' and '+' lines). Include a few lines of context around each change.",
+                    },
+                },
+                "required": ["filepath", "diff"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "edit",
+            "description": "Replaces a block of text in a file. The block must match exactly once unless replace_all is set; surrounding whitespace is ignored if no exact match exists.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "filepath": {
+                        "type": "string",
+                        "description": "The path of the file to edit.",
+                    },
+                    "search": {
+                        "type": "string",
+                        "description": "The existing text to replace. Include enough lines to make it unique.",
+                    },
+                    "replace": {
+                        "type": "string",
+                        "description": "The new text.",
+                    },
+                    "replace_all": {
+                        "type": "boolean",
+                        "description": "Replace every occurrence instead of exactly one.",
+                        "default": False,
+                    },
+                },
+                "required": ["filepath", "search", "replace"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+    },
 ]
 
 _memory = [
@@ -0,0 +1,301 @@
+# agent/tools/consolidate.py
+"""
+Copyright © 2025 Austin Berrio
+
+Background consolidation of agent memories.
+
+`memory_store` only replaces a memory that closely matches the new fact, so
+near-duplicates still accumulate and the table grows without bound. A
+`MemoryConsolidator` runs on a background thread and, every `interval` seconds:
+
+1. Deduplicates: the next `batch` memories (by id) are compared against all
+   others. With embeddings available, memories whose cosine similarity is at
+   least `threshold` are near-duplicates; otherwise MinHash signatures of their
+   words and word pairs are compared with locality-sensitive hashing and an
+   estimated Jaccard similarity of at least `minhash_threshold`. Each cluster
+   of near-duplicates is merged into its most recently written memory, which
+   inherits the cluster's access count and last recall time.
+2. Evicts: while the table holds more than `max_memories` rows, the memories
+   with the lowest value are deleted, where
+       value = (1 + access_count) * 0.5 ** (days since last recall / half_life)
+   and memories that were never recalled age from when they were written.
+
+Once every memory has been compared, later passes only look at new ones. The
+expensive comparisons run without holding `memory_lock`; merges and evictions
+take it and re-read the rows, so they never race the agent's memory tools.
+
+Usage:
+    consolidator = MemoryConsolidator.from_config(on_change=cache.clear)
+    consolidator.start()
+    ...
+    consolidator.stop()
+"""
+
+import threading
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from agent.config import config
+from agent.tools.memory import (
+    TOKEN,
+    memory_config,
+    memory_connect,
+    memory_embedder,
+    memory_lock,
+    memory_vectors,
+)
+
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16  # 4 rows per band
+MINHASH_PRIME = 4294967311  # smallest prime above 2**32
+
+
+def shingles(text: str) -> Set[str]:
+    """Return the lower-cased words and adjacent word pairs of a text."""
+    words = [word.lower() for word in TOKEN.findall(text)]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+class MinHash:
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and b < 2**32 keep a * h + b below 2**64 for 32-bit hashes
+        self.a = rng.integers(1, 1 << 31, size=(permutations, 1), dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=(permutations, 1), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        tokens = shingles(text) or {""}
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64
+        )
+        return ((self.a * hashes + self.b) % MINHASH_PRIME).min(axis=1)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimate the Jaccard similarity of the texts behind two signatures."""
+        return float(np.mean(a == b))
+
+
+def clusters(pairs: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    """Group ids connected by pairs (union-find)."""
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+    groups: Dict[int, List[int]] = {}
+    for x in list(parent):
+        groups.setdefault(find(x), []).append(x)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+class MemoryConsolidator:
+    def __init__(
+        self,
+        interval: float = 300.0,
+        threshold: float = 0.92,
+        minhash_threshold: float = 0.8,
+        max_memories: int = 10000,
+        half_life: float = 30.0,
+        batch: int = 256,
+        enabled: bool = True,
+        on_change: Optional[Callable[[], None]] = None,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.minhash_threshold = minhash_threshold
+        self.max_memories = max_memories
+        self.half_life = half_life
+        self.batch = batch
+        self.enabled = enabled
+        self.on_change = on_change  # called after memories were merged or evicted
+        self.cursor = 0  # memories up to this id have been compared
+        self.minhash = MinHash()
+        self._signatures: Dict[int, Tuple[str, np.ndarray]] = {}  # id -> (content, signature)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.logger = config.get_logger("logger", self.__class__.__name__)
+
+    @classmethod
+    def from_config(
+        cls, on_change: Optional[Callable[[], None]] = None
+    ) -> "MemoryConsolidator":
+        return cls(
+            interval=memory_config("consolidate_interval", 300.0),
+            threshold=memory_config("merge_threshold", 0.92),
+            minhash_threshold=memory_config("minhash_threshold", 0.8),
+            max_memories=memory_config("max_memories", 10000),
+            half_life=memory_config("half_life", 30.0),
+            batch=memory_config("consolidate_batch", 256),
+            enabled=memory_config("consolidate", True),
+            on_change=on_change,
+        )
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="memory-consolidator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                stats = self.run_once()
+                if stats["merged"] or stats["evicted"]:
+                    self.logger.info(f"Consolidated memories: {stats}")
+            except Exception as e:  # keep the job alive; the next pass retries
+                self.logger.error(f"Memory consolidation failed: {e}")
+
+    def run_once(self) -> Dict[str, int]:
+        """Run one deduplication and eviction pass."""
+        merged = 0
+        # on a backlog, keep comparing batches until caught up or stopped
+        while not self._stop.is_set():
+            count, done = self.deduplicate()
+            merged += count
+            if done:
+                break
+        evicted = self.evict()
+        if (merged or evicted) and self.on_change is not None:
+            self.on_change()
+        return {"merged": merged, "evicted": evicted}
+
+    #
+    # Deduplication
+    #
+
+    def deduplicate(self) -> Tuple[int, bool]:
+        """Compare the next batch of memories; return (merged, caught up)."""
+        rows = memory_connect().execute(
+            "SELECT id, content FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+            (self.cursor, self.batch),
+        ).fetchall()
+        if not rows:
+            return 0, True
+        vectors = memory_vectors()
+        if memory_embedder().enabled and vectors.ready():
+            pairs = self._similar_embeddings([mem_id for mem_id, _ in rows])
+        else:
+            pairs = self._similar_minhash(rows)
+        self.cursor = rows[-1][0]
+        merged = sum(self.merge(cluster) for cluster in clusters(pairs))
+        return merged, len(rows) < self.batch
+
+    def _similar_embeddings(self, ids: List[int]) -> List[Tuple[int, int]]:
+        index = memory_vectors().index
+        found = [(mem_id, index.get(mem_id)) for mem_id in ids]
+        found = [(mem_id, vector) for mem_id, vector in found if vector is not None]
+        if not found:
+            return []
+        queries = np.stack([vector for _, vector in found])
+        results = index.search_batch(queries, k=8, threshold=self.threshold)
+        return [
+            (mem_id, other)
+            for (mem_id, _), hits in zip(found, results)
+            for other, _ in hits
+            if other != mem_id
+        ]
+
+    def _similar_minhash(self, batch: List[Tuple[int, str]]) -> List[Tuple[int, int]]:
+        rows = memory_connect().execute("SELECT id, content FROM memories").fetchall()
+        signatures = {}
+        for mem_id, content in rows:
+            cached = self._signatures.get(mem_id)
+            if cached is None or cached[0] != content:
+                cached = (content, self.minhash.signature(content))
+            signatures[mem_id] = cached
+        self._signatures = signatures
+
+        rows_per_band = MINHASH_PERMUTATIONS // MINHASH_BANDS
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        for mem_id, (_, signature) in signatures.items():
+            for band in range(MINHASH_BANDS):
+                key = signature[band * rows_per_band : (band + 1) * rows_per_band].tobytes()
+                buckets.setdefault((band, key), []).append(mem_id)
+
+        pairs = []
+        for mem_id, _ in batch:
+            if mem_id not in signatures:
+                continue
+            signature = signatures[mem_id][1]
+            candidates: Set[int] = set()
+            for band in range(MINHASH_BANDS):
+                key = signature[band * rows_per_band : (band + 1) * rows_per_band].tobytes()
+                candidates.update(buckets.get((band, key), ()))
+            candidates.discard(mem_id)
+            for other in candidates:
+                similarity = MinHash.similarity(signature, signatures[other][1])
+                if similarity >= self.minhash_threshold:
+                    pairs.append((mem_id, other))
+        return pairs
+
+    def merge(self, ids: List[int]) -> int:
+        """Merge memories into the most recently written one; return how many were removed."""
+        placeholders = ", ".join("?" * len(ids))
+        with memory_lock, memory_connect() as conn:
+            rows = conn.execute(
+                "SELECT id, timestamp, access_count, last_recall FROM memories "
+                f"WHERE id IN ({placeholders})",
+                ids,
+            ).fetchall()
+            if len(rows) < 2:
+                return 0
+            keep = max(rows, key=lambda row: (row[1] or "", row[0]))
+            recalls = [row[3] for row in rows if row[3]]
+            conn.execute(
+                "UPDATE memories SET access_count = ?, last_recall = ? WHERE id = ?",
+                (sum(row[2] or 0 for row in rows), max(recalls, default=None), keep[0]),
+            )
+            removed = [row[0] for row in rows if row[0] != keep[0]]
+            conn.executemany("DELETE FROM memories WHERE id = ?", [(i,) for i in removed])
+        self._forget(removed)
+        return len(removed)
+
+    #
+    # Eviction
+    #
+
+    def evict(self) -> int:
+        """Delete the lowest-value memories above the size cap; return how many."""
+        if self.max_memories <= 0:
+            return 0
+        with memory_lock, memory_connect() as conn:
+            count = conn.execute("SELECT count(*) FROM memories").fetchone()[0]
+            excess = count - self.max_memories
+            if excess <= 0:
+                return 0
+            rows = conn.execute(
+                "SELECT id, access_count, julianday('now', 'localtime') - "
+                "julianday(COALESCE(last_recall, timestamp)) FROM memories"
+            ).fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            counts = np.array([row[1] or 0 for row in rows], dtype=np.float64)
+            ages = np.array([row[2] for row in rows], dtype=np.float64)
+            value = (1 + counts) * 0.5 ** (np.nan_to_num(np.maximum(ages, 0.0)) / self.half_life)
+            victims = [int(i) for i in ids[np.argpartition(value, excess - 1)[:excess]]]
+            conn.executemany("DELETE FROM memories WHERE id = ?", [(i,) for i in victims])
+        self._forget(victims)
+        return len(victims)
+
+    def _forget(self, ids: List[int]) -> None:
+        vectors = memory_vectors()
+        for mem_id in ids:
+            vectors.remove(mem_id)
+            self._signatures.pop(mem_id, None)
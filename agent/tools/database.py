@@ -0,0 +1,95 @@
+# agent/tools/database.py
+"""
+Copyright © 2025 Austin Berrio
+
+Shared SQLite connections for the agent database.
+
+Opening a connection costs far more than the statements the agent runs on it,
+so every thread keeps one open connection per database file and reuses it (and
+its compiled statement cache) for the lifetime of the process.
+
+Each connection is configured once when it is opened:
+    - journal_mode=WAL:     readers never block the writer and vice versa.
+    - synchronous=NORMAL:   fsync at checkpoints instead of every commit; safe
+                            with WAL (a crash can only lose the last commits).
+    - mmap_size:            read pages through a memory map.
+    - cache_size:           page cache per connection (negative means KiB).
+    - busy_timeout:         wait for a competing writer instead of failing.
+
+Use the connection as a context manager to commit (or roll back) a transaction.
+Do not close it; `database_close` closes every connection at exit.
+
+Usage:
+    with database_connect() as conn:
+        conn.execute("INSERT INTO memories (content) VALUES (?)", ("...",))
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+from agent.config import DEFAULT_PATH_STOR, config
+
+CACHED_STATEMENTS = 256
+
+# (thread id, path) -> connection; a thread only ever uses its own connections
+_connections: Dict[Tuple[int, str], sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def database_path(path: Optional[str] = None) -> str:
+    return path or config.get_value("database.path", DEFAULT_PATH_STOR)
+
+
+def database_open(path: str) -> sqlite3.Connection:
+    """Open and configure a new connection to `path`."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # check_same_thread is off so that database_close() can close it from any thread
+    conn = sqlite3.connect(
+        path, check_same_thread=False, cached_statements=CACHED_STATEMENTS
+    )
+    settings = config.get_value("database") or {}  # keeps 0, e.g. mmap_size = 0
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {int(settings.get('mmap_size', 1 << 28))}")
+    conn.execute(f"PRAGMA cache_size = {int(settings.get('cache_size', -16384))}")
+    conn.execute(f"PRAGMA busy_timeout = {int(settings.get('busy_timeout', 5000))}")
+    return conn
+
+
+def database_connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Return the calling thread's connection to `path`, opening it on first use."""
+    key = (threading.get_ident(), database_path(path))
+    conn = _connections.get(key)
+    if conn is None:
+        conn = database_open(key[1])
+        with _lock:
+            _connections[key] = conn
+    return conn
+
+
+def database_close(path: Optional[str] = None) -> None:
+    """Close the connections to `path` (or to every database) in all threads.
+
+    Only call this once no other thread is using them, e.g. at exit or before
+    removing a database file. Later calls to `database_connect` reopen them.
+    """
+    target = None if path is None else os.path.abspath(path)
+    with _lock:
+        keys = [
+            key
+            for key in _connections
+            if target is None or os.path.abspath(key[1]) == target
+        ]
+        closing = [_connections.pop(key) for key in keys]
+    for conn in closing:
+        conn.close()
+
+
+atexit.register(database_close)
+# a forked child must not share its parent's connections
+os.register_at_fork(after_in_child=_connections.clear)
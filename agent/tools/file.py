@@ -1,12 +1,102 @@
 """
 agent.tools.file
 
+Ranged reads seek straight to the first requested line using a `LineIndex`:
+the byte offset of every line start, built once per file with a vectorized
+newline scan over an mmap and cached until the file's mtime or size changes.
+
+Writes never modify a file in place. The new contents are streamed into a
+temporary file next to it (unchanged byte ranges are copied through the line
+index), fsync'd and atomically renamed over the original, so a crash leaves
+either the old or the new file and memory use does not grow with file size.
+
 Usage Example:
     content = file_read('path/to/your/file.py', 100, 200)
     # This reads lines 100 to 200 of the file
 """
 
-from typing import Optional
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Optional
+
+import numpy as np
+
+from agent.tools.output import OutputBudget
+
+INDEX_CHUNK = 1 << 24  # bytes scanned per vectorized pass (bounds temporary memory)
+INDEX_CACHE = 32  # indexed files kept in memory
+COPY_CHUNK = 1 << 20
+
+
+class LineIndex:
+    """Byte offsets of line starts for one version of a file."""
+
+    _cache: OrderedDict[str, "LineIndex"] = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, stamp: tuple[int, int, int], starts: np.ndarray, size: int):
+        self.stamp = stamp  # (inode, mtime_ns, size) when the index was built
+        self.starts = starts
+        self.size = size
+
+    @property
+    def lines(self) -> int:
+        return len(self.starts)
+
+    def offset(self, line: int) -> int:
+        """Return the byte offset where the 0-based `line` starts (size if past the end)."""
+        if line >= self.lines:
+            return self.size
+        return int(self.starts[max(0, line)])
+
+    def span(self, start: int, end: Optional[int] = None) -> tuple[int, int]:
+        """Return the byte range covering 0-based lines [start, end)."""
+        return self.offset(start), self.size if end is None else self.offset(end)
+
+    @staticmethod
+    def stat(filepath: str) -> tuple[int, int, int]:
+        st = os.stat(filepath)
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @classmethod
+    def build(cls, filepath: str) -> "LineIndex":
+        with open(filepath, "rb") as f:
+            st = os.fstat(f.fileno())
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if st.st_size == 0:
+                return cls(stamp, np.zeros(0, dtype=np.int64), 0)
+            parts = [np.zeros(1, dtype=np.int64)]
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                data = np.frombuffer(m, dtype=np.uint8)
+                for lo in range(0, st.st_size, INDEX_CHUNK):
+                    newlines = np.flatnonzero(data[lo : lo + INDEX_CHUNK] == 10)
+                    parts.append(newlines.astype(np.int64) + (lo + 1))
+                del data  # release the buffer before the mmap closes
+        starts = np.concatenate(parts)
+        if starts[-1] == st.st_size:  # a trailing newline does not start a line
+            starts = starts[:-1]
+        return cls(stamp, starts, st.st_size)
+
+    @classmethod
+    def get(cls, filepath: str) -> "LineIndex":
+        """Return the cached index for a file, rebuilding it if the file changed."""
+        key = os.path.realpath(filepath)
+        stamp = cls.stat(key)
+        with cls._lock:
+            index = cls._cache.get(key)
+            if index is not None and index.stamp == stamp:
+                cls._cache.move_to_end(key)
+                return index
+        index = cls.build(key)
+        with cls._lock:
+            cls._cache[key] = index
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > INDEX_CACHE:
+                cls._cache.popitem(last=False)
+        return index
 
 
 def file_read(
@@ -17,21 +107,31 @@ def file_read(
     """
     Reads lines from start_line to end_line (inclusive, 1-based) from a file.
     If end_line is None, reads to the end.
+    Large ranges keep their head and tail and name the omitted lines.
     """
     # Convert to zero-based indices for internal use
     start = max(0, start_line - 1)
     # If end_line is provided, it's inclusive (natural style), so +1 for slicing
     end = end_line if end_line is not None else None
 
-    lines = []
-    with open(filepath, "r") as f:
-        for i, line in enumerate(f):
-            if i < start:
-                continue
-            if end is not None and i > (end - 1):
+    # seek straight to the first requested line
+    index = LineIndex.get(filepath)
+    lo, hi = index.span(start, end)
+
+    # the file itself is the handle for omitted lines, so nothing is spilled
+    budget = OutputBudget(spill=False)
+    with open(filepath, "rb") as f:
+        f.seek(lo)
+        remaining = hi - lo
+        while remaining > 0:
+            chunk = f.read(min(COPY_CHUNK, remaining))
+            if not chunk:
                 break
-            lines.append(line)
-    return "".join(lines)
+            if chunk.endswith(b"\r") and remaining > len(chunk):
+                chunk += f.read(1)  # keep \r\n pairs together
+            remaining -= len(chunk)
+            budget.write(chunk.replace(b"\r\n", b"\n"))  # match text mode
+    return budget.text(source=filepath, first_line=start + 1)
 
 
 def file_write(
@@ -45,25 +145,70 @@ def file_write(
     If both are None, overwrite the entire file.
     """
     try:
+        data = content.encode("utf-8")
         if start_line is None and end_line is None:
-            with open(filepath, "w") as f:
-                f.write(content)
+            file_replace(filepath, lambda f: f.write(data))
             return f"Wrote {len(content)} bytes to '{filepath}'."
 
-        # Read all lines first
-        with open(filepath, "r") as f:
-            lines = f.readlines()
-
         # Adjust to 0-based index (inclusive range)
         start = (start_line - 1) if start_line else 0
         end = (end_line) if end_line else start + 1
 
-        # Replace the slice (note: end is exclusive in Python slice)
-        replacement = content.splitlines(keepends=True)
-        lines[start:end] = replacement
+        # Replace the byte range of lines[start:end] (end is exclusive, and an
+        # empty slice inserts at start, just like a list splice)
+        index = LineIndex.get(filepath)
+        lo, hi = index.span(start, max(start, end))
+
+        def splice(f: BinaryIO) -> None:
+            with open(filepath, "rb") as src:
+                copy_range(src, f, 0, lo)
+                f.write(data)
+                copy_range(src, f, hi, index.size)
 
-        with open(filepath, "w") as f:
-            f.writelines(lines)
+        file_replace(filepath, splice)
         return f"Wrote {len(content)} bytes to '{filepath}' in range({start_line}, {end_line})."
     except Exception as e:
         return f"Error: {e}"
+
+
+def copy_range(src: BinaryIO, dst: BinaryIO, lo: int, hi: int) -> None:
+    """Copy bytes [lo, hi) from src to dst in bounded chunks."""
+    src.seek(lo)
+    remaining = hi - lo
+    while remaining > 0:
+        chunk = src.read(min(COPY_CHUNK, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def file_replace(filepath: str, fill: Callable[[BinaryIO], None]) -> None:
+    """Atomically replace a file with the bytes that `fill` writes."""
+    target = os.path.realpath(filepath)  # replace the file, not a symlink to it
+    directory = os.path.dirname(target)
+    try:
+        mode = os.stat(target).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(target)}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            fill(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    # persist the rename itself
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
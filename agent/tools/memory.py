@@ -1,11 +1,42 @@
 """
 Module: agent.tools.memory
+
+Memories live in the `memories` table of the agent database. An FTS5 index
+(`memories_fts`) mirrors their content through triggers, so lookups are ranked
+by BM25 instead of scanning every row with `LIKE`. Databases created before the
+index existed are migrated by `memory_initialize`. When SQLite is built without
+FTS5, searches fall back to `LIKE`.
+
+Memories are also embedded with the `model.embed` model when they are written
+and the vector is stored next to them as a float32 blob. All vectors are loaded
+into a `VectorIndex` (see `agent.tools.vector`) the first time they are needed
+and kept in sync on every write, so semantic lookups are a single matrix-vector
+product. Memories written while the embedding server was unreachable are
+embedded once it is back. Until then, and when `memory.semantic` is disabled,
+lookups use the full-text index.
+
+Each lookup has a mode:
+    mode    | used by | full-text match            | min. cosine similarity
+    any     | recall  | any of the words           | memory.recall_threshold
+    all     | forget  | every word                 | memory.forget_threshold
+    phrase  | store   | the words in order         | memory.match_threshold
 """
 
 import json
+import re
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from requests.exceptions import RequestException
 
 from agent.config import DEFAULT_PATH_STOR, config
+from agent.llama.client import LlamaCppEmbedding
+from agent.tools.database import database_connect
+from agent.tools.vector import VectorIndex, from_blob, normalize, to_blob
 
 #
 # Database operations
@@ -13,15 +44,87 @@ from agent.config import DEFAULT_PATH_STOR, config
 
 DB_PATH = config.get_value("database.path", default=DEFAULT_PATH_STOR)
 
+TOKEN = re.compile(r"\w+")
+
+# minimum cosine similarity of a semantic match per lookup mode
+SIMILARITY = {
+    "any": ("recall_threshold", 0.3),
+    "all": ("forget_threshold", 0.6),
+    "phrase": ("match_threshold", 0.85),
+}
+
+EMBED_BATCH = 64
+EMBED_CACHE = 64
+
+# columns added after the first release; existing tables are migrated
+MEMORY_COLUMNS = {
+    "embedding": "BLOB",  # embedded lazily
+    "access_count": "INTEGER NOT NULL DEFAULT 0",  # times returned by recall
+    "last_recall": "DATETIME",
+}
+
+# serializes writers: the agent's memory tools and the consolidation job
+memory_lock = threading.RLock()
+
+# None until probed; whether memories_fts exists in DB_PATH
+_fts_ready: Optional[bool] = None
+
+
+def memory_config(key: str, default: Any) -> Any:
+    """Read `memory.<key>`; unlike get_value(), False and 0 are not replaced by the default."""
+    return (config.get_value("memory") or {}).get(key, default)
+
 
 def memory_connect() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH)
+    return database_connect(DB_PATH)
+
+
+def memory_fts_initialize(conn: sqlite3.Connection) -> bool:
+    """Create the FTS5 index and its triggers; build it for existing rows."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'"
+    ).fetchone()
+    if exists:
+        return True
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE memories_fts USING fts5(
+                content,
+                content='memories',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        return False  # no FTS5 in this SQLite build
+    conn.executescript(
+        """
+        CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+            INSERT INTO memories_fts (rowid, content) VALUES (new.id, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+            INSERT INTO memories_fts (memories_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS memories_au AFTER UPDATE OF content ON memories BEGIN
+            INSERT INTO memories_fts (memories_fts, rowid, content)
+            VALUES ('delete', old.id, old.content);
+            INSERT INTO memories_fts (rowid, content) VALUES (new.id, new.content);
+        END;
+        """
+    )
+    # migrate: index the rows written before the index existed
+    conn.execute("INSERT INTO memories_fts (memories_fts) VALUES ('rebuild')")
+    return True
 
 
 # this must be called by the user, not the agent
-def memory_initialize() -> sqlite3.Cursor:
+def memory_initialize() -> None:
+    global _fts_ready
     with memory_connect() as conn:
-        return conn.execute(
+        conn.execute(
             """
             CREATE TABLE IF NOT EXISTS memories (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,6 +133,223 @@ def memory_initialize() -> sqlite3.Cursor:
             )
             """
         )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(memories)")]
+        for name, definition in MEMORY_COLUMNS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE memories ADD COLUMN {name} {definition}")
+        _fts_ready = memory_fts_initialize(conn)
+
+
+def memory_fts_ready(conn: sqlite3.Connection) -> bool:
+    global _fts_ready
+    if _fts_ready is None:
+        _fts_ready = bool(
+            conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'memories_fts'"
+            ).fetchone()
+        )
+    return _fts_ready
+
+
+def memory_match(query: str, mode: str = "any") -> Optional[str]:
+    """Translate free text into an FTS5 match expression, or None if it has no words."""
+    tokens = TOKEN.findall(query)
+    if not tokens:
+        return None
+    if mode == "phrase":
+        return '"' + " ".join(tokens) + '"'
+    quoted = [f'"{token}"' for token in tokens]  # quoting keeps AND/OR/NEAR literal
+    return (" OR " if mode == "any" else " AND ").join(quoted)
+
+
+#
+# Embeddings
+#
+
+
+class MemoryEmbedder:
+    """Embed text with the configured model, backing off while the server is down."""
+
+    def __init__(self):
+        self.client = LlamaCppEmbedding()
+        self.failed: Optional[float] = None  # time.monotonic() of the last failure
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        if not memory_config("semantic", True):
+            return False
+        if self.failed is None:
+            return True
+        return time.monotonic() - self.failed >= memory_config("retry_interval", 60.0)
+
+    def embed(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Return one normalised vector per text, or None if embedding is unavailable."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            cached = {t: self._cache[t] for t in texts if t in self._cache}
+            for text in cached:
+                self._cache.move_to_end(text)
+        missing = list(dict.fromkeys(t for t in texts if t not in cached))
+        if missing:
+            try:
+                model = config.get_value("model.embed")
+                response = self.client.create(model, missing)
+                data = sorted(response["data"], key=lambda item: item["index"])
+                vectors = normalize([item["embedding"] for item in data])
+                if len(vectors) != len(missing):
+                    raise ValueError(f"expected {len(missing)} embeddings, got {len(vectors)}")
+            except (RequestException, KeyError, TypeError, ValueError) as e:
+                self.client.logger.warning(f"Embedding unavailable, using full-text search: {e}")
+                self.failed = time.monotonic()
+                return None
+            self.failed = None
+            cached.update(zip(missing, vectors))
+            if len(texts) == 1:  # lookups and single writes repeat; batches do not
+                with self._lock:
+                    self._cache[texts[0]] = vectors[0]
+                    while len(self._cache) > EMBED_CACHE:
+                        self._cache.popitem(last=False)
+        return np.stack([cached[t] for t in texts])
+
+
+class MemoryVectors:
+    """Embeddings of every memory in a database, kept in sync by the CRUD functions."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = VectorIndex()
+        self.pending: Dict[int, str] = {}  # id -> content of memories without a vector
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        """Load the stored vectors once and embed missing ones; True if complete."""
+        with self._lock:
+            if not self.loaded:
+                self._load()
+            if self.pending:
+                self._backfill()
+            return not self.pending
+
+    def put(self, mem_id: int, content: str, vector: Optional[np.ndarray]) -> None:
+        with self._lock:
+            if not self.loaded:
+                return  # picked up by _load
+            if vector is None or (self.index.dim and vector.shape != (self.index.dim,)):
+                self.index.remove(mem_id)
+                self.pending[mem_id] = content
+            else:
+                self.index.add(mem_id, vector)
+                self.pending.pop(mem_id, None)
+
+    def remove(self, mem_id: int) -> None:
+        with self._lock:
+            self.index.remove(mem_id)
+            self.pending.pop(mem_id, None)
+
+    def rebase(self, dim: int) -> None:
+        """Drop vectors that do not have `dim` dimensions (the model changed)."""
+        with self._lock:
+            self._rebase(dim)
+
+    def _rebase(self, dim: int) -> None:
+        with database_connect(self.path) as conn:
+            conn.execute(
+                "UPDATE memories SET embedding = NULL WHERE length(embedding) != ?",
+                (dim * 4,),
+            )
+        self.index = VectorIndex()
+        self.pending.clear()
+        self.loaded = False
+
+    def _load(self) -> None:
+        with database_connect(self.path) as conn:
+            rows = conn.execute("SELECT id, content, embedding FROM memories").fetchall()
+        # vectors from another embedding model are re-embedded
+        dims = [len(blob) // 4 for _, _, blob in rows if blob]
+        dim = max(set(dims), key=dims.count) if dims else None
+        for mem_id, content, blob in rows:
+            if blob and len(blob) // 4 == dim:
+                self.index.add(mem_id, from_blob(blob))
+            else:
+                self.pending[mem_id] = content
+        self.loaded = True
+
+    def _backfill(self) -> None:
+        items = list(self.pending.items())
+        for i in range(0, len(items), EMBED_BATCH):
+            batch = items[i : i + EMBED_BATCH]
+            vectors = memory_embedder().embed([content for _, content in batch])
+            if vectors is None:
+                return
+            if self.index.dim and vectors.shape[1] != self.index.dim:
+                self._rebase(vectors.shape[1])
+                return
+            with database_connect(self.path) as conn:
+                conn.executemany(
+                    "UPDATE memories SET embedding = ? WHERE id = ?",
+                    [(to_blob(v), mem_id) for (mem_id, _), v in zip(batch, vectors)],
+                )
+            for (mem_id, _), vector in zip(batch, vectors):
+                self.index.add(mem_id, vector)
+                del self.pending[mem_id]
+
+
+_embedder: Optional[MemoryEmbedder] = None
+_vectors: Optional[MemoryVectors] = None
+
+
+def memory_embedder() -> MemoryEmbedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = MemoryEmbedder()
+    return _embedder
+
+
+def memory_vectors() -> MemoryVectors:
+    global _vectors
+    if _vectors is None or _vectors.path != DB_PATH:
+        _vectors = MemoryVectors(DB_PATH)
+    return _vectors
+
+
+def memory_embed(content: str) -> Optional[np.ndarray]:
+    vectors = memory_embedder().embed([content])
+    return None if vectors is None else vectors[0]
+
+
+def memory_semantic(
+    query: str, limit: int, mode: str
+) -> Optional[List[Tuple[int, str, float]]]:
+    """Rank memories by cosine similarity, or None if embeddings are unavailable."""
+    if not memory_embedder().enabled:
+        return None
+    vectors = memory_vectors()
+    if not vectors.ready():
+        return None
+    vector = memory_embed(query)
+    if vector is None:
+        return None
+    if vectors.index.dim and vector.shape != (vectors.index.dim,):
+        vectors.rebase(vector.shape[0])
+        if not vectors.ready():
+            return None
+    key, default = SIMILARITY[mode]
+    hits = vectors.index.search(vector, limit, memory_config(key, default))
+    if not hits:
+        return []
+    ids = [mem_id for mem_id, _ in hits]
+    with memory_connect() as conn:
+        contents = dict(
+            conn.execute(
+                f"SELECT id, content FROM memories WHERE id IN ({', '.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        )
+    return [(mem_id, contents[mem_id], score) for mem_id, score in hits if mem_id in contents]
 
 
 #
@@ -38,64 +358,109 @@ def memory_initialize() -> sqlite3.Cursor:
 
 
 def memory_create(content: str) -> str:
-    with memory_connect() as conn:
+    vector = memory_embed(content)
+    with memory_lock, memory_connect() as conn:
         cur = conn.cursor()
         cur.execute(
-            "INSERT INTO memories (content) VALUES (?)",
-            (content,),
+            "INSERT INTO memories (content, embedding) VALUES (?, ?)",
+            (content, None if vector is None else to_blob(vector)),
         )
-        conn.commit()
-        return f"Memory created (ID={cur.lastrowid})"
+    memory_vectors().put(cur.lastrowid, content, vector)
+    return f"Memory created (ID={cur.lastrowid})"
 
 
-def memory_search(query: str, limit: int = 5) -> str:
-    with memory_connect() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, content FROM memories WHERE content LIKE ? LIMIT ?",
-            (f"%{query}%", limit),
+def memory_search(query: str, limit: int = 5, mode: str = "any") -> str:
+    return json.dumps(_lookup(query, limit, mode), ensure_ascii=False)
+
+
+def memory_touch(ids: List[int]) -> None:
+    """Count a recall of the given memories."""
+    if not ids:
+        return
+    with memory_lock, memory_connect() as conn:
+        conn.executemany(
+            "UPDATE memories SET access_count = access_count + 1, "
+            "last_recall = datetime('now', 'localtime') WHERE id = ?",
+            [(mem_id,) for mem_id in ids],
         )
-        rows = cur.fetchall()
-        result = [{"id": r[0], "content": r[1]} for r in rows]
-        return json.dumps(result, ensure_ascii=False)
+
+
+def _lookup(query: str, limit: int, mode: str) -> List[Dict[str, Any]]:
+    hits = memory_semantic(query, limit, mode)
+    if hits is not None:
+        return [
+            {"id": mem_id, "content": content, "score": round(score, 3)}
+            for mem_id, content, score in hits
+        ]
+    rows = _search(memory_connect(), query, limit, mode)
+    return [{"id": r[0], "content": r[1]} for r in rows]
+
+
+def _best(query: str, mode: str) -> Optional[int]:
+    """Return the id of the best match for `query`, if any."""
+    hits = memory_semantic(query, 1, mode)
+    if hits is None:
+        hits = _search(memory_connect(), query, 1, mode)
+    return hits[0][0] if hits else None
+
+
+def _search(
+    conn: sqlite3.Connection, query: str, limit: int, mode: str
+) -> List[Tuple[int, str]]:
+    if memory_fts_ready(conn):
+        match = memory_match(query, mode)
+        if match is None:
+            return []
+        return conn.execute(
+            """
+            SELECT m.id, m.content
+            FROM memories_fts
+            JOIN memories AS m ON m.id = memories_fts.rowid
+            WHERE memories_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (match, limit),
+        ).fetchall()
+    return conn.execute(
+        "SELECT id, content FROM memories WHERE content LIKE ? LIMIT ?",
+        (f"%{query}%", limit),
+    ).fetchall()
 
 
 def memory_update(query: str, new_content: str) -> str:
     """
-    Updates the most relevant memory based on a simple LIKE search.
+    Updates the memory most similar to the query (or, without embeddings, the
+    best-ranked memory containing it as a phrase).
     If no result exists, creates a new memory.
     """
-    results = json.loads(memory_search(query, limit=1))
+    mem_id = _best(query, "phrase")
 
-    if results:
-        mem = results[0]
-        mem_id = mem["id"]
+    if mem_id is not None:
+        vector = memory_embed(new_content)
 
-        with memory_connect() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "UPDATE memories SET content = ?, timestamp = CURRENT_TIMESTAMP WHERE id = ?",
-                (new_content, mem_id),
+        with memory_lock, memory_connect() as conn:
+            conn.execute(
+                "UPDATE memories SET content = ?, embedding = ?, "
+                "timestamp = datetime('now', 'localtime') WHERE id = ?",
+                (new_content, None if vector is None else to_blob(vector), mem_id),
             )
-            conn.commit()
-            return f"Memory updated (ID={mem_id})"
+        memory_vectors().put(mem_id, new_content, vector)
+        return f"Memory updated (ID={mem_id})"
 
     # No match, create new
     return memory_create(new_content)
 
 
 def memory_delete(query: str) -> str:
-    results = json.loads(memory_search(query, limit=1))
+    mem_id = _best(query, "all")
 
-    if not results:
+    if mem_id is None:
         return "No matching memory found."
 
-    mem_id = results[0]["id"]
-
-    with memory_connect() as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM memories WHERE id = ?", (mem_id,))
-        conn.commit()
+    with memory_lock, memory_connect() as conn:
+        conn.execute("DELETE FROM memories WHERE id = ?", (mem_id,))
+    memory_vectors().remove(mem_id)
 
     return f"Memory deleted (ID={mem_id})"
 
@@ -106,12 +471,16 @@ def memory_delete(query: str) -> str:
 
 
 def memory_store(fact: str) -> str:
-    return memory_update(fact, fact)
+    with memory_lock:
+        return memory_update(fact, fact)
 
 
 def memory_recall(query: str, limit: int = 5) -> str:
-    return memory_search(query, limit)
+    results = _lookup(query, limit, "any")
+    memory_touch([r["id"] for r in results])
+    return json.dumps(results, ensure_ascii=False)
 
 
 def memory_forget(query: str) -> str:
-    return memory_delete(query)
+    with memory_lock:
+        return memory_delete(query)
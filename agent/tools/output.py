@@ -0,0 +1,203 @@
+# agent/tools/output.py
+"""
+Copyright © 2025 Austin Berrio
+
+Bounded tool output.
+
+Tools stream their output into an `OutputBudget`, which keeps at most
+`output.max_bytes` in memory: the head and the tail of the stream, split by
+`output.head_ratio`. Once the budget is exceeded, the complete output is
+streamed to a spill file named after its SHA-256 digest under `output.spill`,
+so identical outputs share one file.
+
+The text returned to the model contains the head, a marker naming the omitted
+line range and the file that holds it, and the tail. The model pages through
+the omitted lines with the `read` tool. When the head or tail ends inside a
+line (minified JSON, one long line of shell output), the marker gives the
+omitted byte range of the spill file instead.
+
+Usage:
+    budget = OutputBudget()
+    for chunk in stream:
+        budget.write(chunk)
+    text = budget.text()
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+from agent.config import DEFAULT_PATH_SPIL, config
+
+
+class OutputBudget:
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        head_ratio: Optional[float] = None,
+        spill: bool = True,
+        spill_dir: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes or config.get_value("output.max_bytes", 16384)
+        ratio = head_ratio if head_ratio is not None else config.get_value("output.head_ratio", 0.5)
+        self.spill = spill
+        self.spill_dir = Path(spill_dir or config.get_value("output.spill", DEFAULT_PATH_SPIL))
+
+        self._head_bytes = int(self.max_bytes * ratio)
+        self._tail_bytes = self.max_bytes - self._head_bytes
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._hash = hashlib.sha256()
+        self._size = 0
+        self._lines = 0
+        self._newline = True  # the stream ends with a newline (or is empty)
+        self._dropped_newline = False  # the byte before the kept tail is a newline
+        self._file: Optional[BinaryIO] = None
+        self._tmp: Optional[str] = None
+        self._path: Optional[Path] = None
+
+    @property
+    def size(self) -> int:
+        """Total number of bytes written."""
+        return self._size
+
+    @property
+    def lines(self) -> int:
+        """Total number of lines written."""
+        return self._lines + (0 if self._newline else 1)
+
+    @property
+    def truncated(self) -> bool:
+        return self._size > self.max_bytes
+
+    def write(self, data: Union[bytes, str]) -> None:
+        if isinstance(data, str):
+            data = data.encode("utf-8", errors="replace")
+        if not data:
+            return
+        self._size += len(data)
+        self._lines += data.count(b"\n")
+        self._newline = data.endswith(b"\n")
+        if self.spill:
+            self._hash.update(data)
+        if self._file is not None:
+            self._file.write(data)
+
+        room = self._head_bytes - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        self._tail += data
+
+        if self.truncated:
+            if self.spill and self._file is None and self._path is None:
+                # the head and the untrimmed tail still hold the whole stream
+                self._open()
+                self._file.write(self._head)
+                self._file.write(self._tail)
+            excess = len(self._tail) - self._tail_bytes
+            if excess > 0:
+                self._dropped_newline = self._tail[excess - 1] == ord("\n")
+                del self._tail[:excess]
+
+    def close(self) -> Optional[Path]:
+        """Finish the spill file and return its path (None if nothing spilled)."""
+        if self._file is None:
+            return self._path
+        self._file.close()
+        self._file = None
+        path = self.spill_dir / f"{self._hash.hexdigest()}.txt"
+        if path.exists():  # content-addressed: identical output already spilled
+            os.unlink(self._tmp)
+        else:
+            os.replace(self._tmp, path)
+        self._path = path
+        return path
+
+    def text(self, source: Optional[str] = None, first_line: int = 1) -> str:
+        """Return the output, replacing the middle with a paging hint if truncated.
+
+        `source` and `first_line` name the file (and the line number the stream
+        started at) that the model should `read` for the omitted lines. They
+        default to the spill file.
+        """
+        if not self.truncated:
+            return (self._head + self._tail).decode("utf-8", errors="replace")
+
+        spilled = self.close()
+        source = source or (str(spilled) if spilled else None)
+
+        # cut at line boundaries so that the omitted range is whole lines
+        head = bytes(self._head)
+        cut = head.rfind(b"\n")
+        if cut >= 0:
+            head = head[: cut + 1]
+        tail = bytes(self._tail)
+        cut = tail.find(b"\n")
+        tail_cut = 0 <= cut < len(tail) - 1
+        if tail_cut:
+            tail = tail[cut + 1 :]
+        # a head or tail without a usable newline is part of a line (e.g. minified JSON)
+        whole = (not head or head.endswith(b"\n")) and (tail_cut or self._dropped_newline)
+
+        tail_lines = tail.count(b"\n") + (0 if self._newline else 1)
+        first = first_line + head.count(b"\n")
+        last = first_line + self.lines - tail_lines - 1
+        omitted = self._size - len(head) - len(tail)
+
+        if whole and first <= last:
+            if source:
+                hint = (
+                    f"lines {first}-{last} of `{source}`; use `read` with "
+                    f"start_line={first} and an end_line to page through them"
+                )
+            else:
+                hint = f"lines {first}-{last}"
+        else:
+            ends = tail_cut or self._dropped_newline  # the omitted bytes end a line
+            hint = self._partial(head, tail, first, ends, source, spilled)
+        marker = f"\n[... {omitted} bytes omitted: {hint} ...]\n"
+        return (
+            head.decode("utf-8", errors="ignore")
+            + marker
+            + tail.decode("utf-8", errors="ignore")
+        )
+
+    # --- internal ---
+
+    def _partial(
+        self,
+        head: bytes,
+        tail: bytes,
+        first: int,
+        ends: bool,
+        source: Optional[str],
+        spilled: Optional[Path],
+    ) -> str:
+        """Describe an omitted range that starts or ends inside a line."""
+        newlines = self._lines - head.count(b"\n") - tail.count(b"\n")
+        last = first + newlines - (1 if ends else 0)
+        where = f"inside line {first}" if last == first else f"lines {first}-{last}, cut mid-line"
+        if spilled is not None and source == str(spilled):
+            start, end = len(head), self._size - len(tail)
+            return (
+                f"bytes {start}-{end - 1} of `{source}` ({where}); page with `shell`, "
+                f"e.g. tail -c +{start + 1} {source} | head -c {self.max_bytes}"
+            )
+        return f"{where} of `{source}`" if source else where
+
+    def _open(self) -> None:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=self.spill_dir, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+
+if __name__ == "__main__":
+    import sys
+
+    budget = OutputBudget()
+    for chunk in iter(lambda: sys.stdin.buffer.read(65536), b""):
+        budget.write(chunk)
+    print(budget.text())
@@ -0,0 +1,271 @@
+"""
+agent.tools.patch
+
+Structured edits that cost tokens proportional to the change instead of the
+range being rewritten.
+
+- patch: apply a unified diff. Hunks are located by their context lines, first
+         exactly, then ignoring trailing whitespace, then ignoring surrounding
+         whitespace. The match closest to the hunk's stated line number wins,
+         so stale or missing line numbers (`@@ @@`) are tolerated.
+- edit:  replace a block of text. Exact matches are preferred; otherwise the
+         block is matched line by line ignoring surrounding whitespace.
+
+Every hunk is located before anything is written. If one fails, the file is
+left untouched and the error names the hunk. Files are replaced atomically
+(see `agent.tools.file.file_replace`).
+
+Usage Example:
+    patch("app.py", "@@ -10,3 +10,3 @@\\n def main():\\n-    run()\\n+    run(debug=True)\\n")
+    edit("app.py", "run()", "run(debug=True)")
+"""
+
+import os
+import re
+from typing import Callable, List, Optional, Tuple
+
+from agent.tools.file import file_replace
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@|^@@\s*@@")
+
+# line comparisons from strict to loose
+MATCHERS: List[Callable[[str], str]] = [
+    lambda line: line,
+    lambda line: line.rstrip(),
+    lambda line: line.strip(),
+]
+
+
+class Hunk:
+    def __init__(self, number: int, start: Optional[int], length: Optional[int] = None):
+        self.number = number  # 1-based position in the diff
+        self.start = start  # 0-based line the hunk claims to start at
+        self.length = length  # number of old lines the header declares
+        self.ops: List[Tuple[str, str]] = []  # (" " | "-" | "+", text)
+
+    @property
+    def old(self) -> List[str]:
+        return [text for op, text in self.ops if op != "+"]
+
+    @property
+    def added(self) -> int:
+        return sum(1 for op, _ in self.ops if op == "+")
+
+    @property
+    def removed(self) -> int:
+        return sum(1 for op, _ in self.ops if op == "-")
+
+
+#
+# Text handling
+#
+
+
+def _load(filepath: str) -> Tuple[List[str], str, bool]:
+    """Return the lines of a file (without endings), its newline and final newline."""
+    with open(filepath, "r", encoding="utf-8", newline="") as f:
+        text = f.read()
+    newline = "\r\n" if "\r\n" in text else "\n"
+    final = text.endswith(newline) or not text
+    if final:
+        text = text[: -len(newline)] if text else text
+    return text.split(newline) if text else [], newline, final
+
+
+def _save(filepath: str, lines: List[str], newline: str, final: bool) -> None:
+    text = newline.join(lines)
+    if final and lines:
+        text += newline
+    data = text.encode("utf-8")
+    file_replace(filepath, lambda f: f.write(data))
+
+
+def _find(
+    lines: List[str], block: List[str], lo: int, expected: int
+) -> Tuple[List[int], int]:
+    """Return the match positions for `block` at the strictest level that matches."""
+    if not block:
+        return [min(max(expected, lo), len(lines))], 0
+    for level, norm in enumerate(MATCHERS):
+        target = [norm(line) for line in block]
+        first = target[0]
+        positions = [
+            i
+            for i in range(lo, len(lines) - len(block) + 1)
+            if norm(lines[i]) == first
+            and all(norm(lines[i + j]) == target[j] for j in range(1, len(block)))
+        ]
+        if positions:
+            return positions, level
+    return [], len(MATCHERS)
+
+
+#
+# Unified diff
+#
+
+
+def parse_diff(diff: str) -> List[Hunk]:
+    lines = diff.splitlines()
+    if not any(HUNK_HEADER.match(line) for line in lines):
+        # a bare block of +/-/space lines is a single hunk without a position
+        lines = ["@@ @@"] + [line for line in lines if not line.startswith(("---", "+++"))]
+
+    hunks: List[Hunk] = []
+    hunk: Optional[Hunk] = None
+    for raw in lines:
+        header = HUNK_HEADER.match(raw)
+        if header:
+            start = length = None
+            if header.group(1):
+                length = int(header.group(2)) if header.group(2) is not None else 1
+                # an empty old range (-N,0) inserts after line N
+                start = int(header.group(1)) if length == 0 else max(0, int(header.group(1)) - 1)
+            hunk = Hunk(len(hunks) + 1, start, length)
+            hunks.append(hunk)
+        elif hunk is None:
+            continue  # file headers (---, +++, diff, index)
+        elif raw.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif raw == "":
+            hunk.ops.append((" ", ""))  # editors often strip the space of blank context lines
+        elif raw[0] in " -+":
+            hunk.ops.append((raw[0], raw[1:]))
+        else:
+            raise ValueError(f"hunk {hunk.number}: unexpected line {raw!r}")
+
+    for hunk in hunks:
+        # drop blank trailing lines that the header does not account for
+        while hunk.length is not None and len(hunk.old) > hunk.length and hunk.ops[-1] == (" ", ""):
+            hunk.ops.pop()
+    return hunks
+
+
+def patch(filepath: str, diff: str) -> str:
+    """Apply a unified diff to a file. Nothing is written unless every hunk applies."""
+    try:
+        hunks = parse_diff(diff)
+        if not hunks:
+            return "Error: The diff contains no hunks."
+
+        if os.path.exists(filepath):
+            lines, newline, final = _load(filepath)
+        elif all(not hunk.old for hunk in hunks):
+            lines, newline, final = [], "\n", True  # create a new file
+        else:
+            return f"Error: No such file: '{filepath}'"
+
+        # 1. locate every hunk
+        located = []  # (position, hunk)
+        lo, shift, fuzzy = 0, 0, 0
+        for hunk in hunks:
+            expected = hunk.start + shift if hunk.start is not None else lo
+            positions, level = _find(lines, hunk.old, lo, expected)
+            if not positions:
+                first = hunk.old[0] if hunk.old else ""
+                return (
+                    f"Error: hunk {hunk.number} does not apply: context starting with "
+                    f"{first!r} was not found after line {lo}. Re-read the file and retry."
+                )
+            position = min(positions, key=lambda p: abs(p - expected))
+            fuzzy += level > 0
+            located.append((position, hunk))
+            lo = position + len(hunk.old)
+            shift = position - hunk.start if hunk.start is not None else shift
+
+        # 2. apply bottom-up so positions stay valid
+        for position, hunk in reversed(located):
+            original = lines[position : position + len(hunk.old)]
+            replacement, k = [], 0
+            for op, text in hunk.ops:
+                if op == " ":
+                    replacement.append(original[k])  # keep the file's own context
+                    k += 1
+                elif op == "-":
+                    k += 1
+                else:
+                    replacement.append(text)
+            lines[position : position + len(hunk.old)] = replacement
+
+        _save(filepath, lines, newline, final)
+        added = sum(hunk.added for hunk in hunks)
+        removed = sum(hunk.removed for hunk in hunks)
+        note = f", {fuzzy} matched fuzzily" if fuzzy else ""
+        return f"Applied {len(hunks)} hunk(s) to '{filepath}' (+{added} -{removed} lines{note})."
+    except Exception as e:
+        return f"Error: {e}"
+
+
+#
+# Search and replace
+#
+
+
+def edit(filepath: str, search: str, replace: str, replace_all: bool = False) -> str:
+    """Replace `search` with `replace` in a file."""
+    try:
+        if not search:
+            return "Error: `search` must not be empty."
+        with open(filepath, "r", encoding="utf-8", newline="") as f:
+            text = f.read()
+
+        count = text.count(search)
+        if count > 1 and not replace_all:
+            return (
+                f"Error: `search` occurs {count} times in '{filepath}'. "
+                "Include more surrounding lines or set replace_all."
+            )
+        if count:
+            text = text.replace(search, replace, -1 if replace_all else 1)
+            file_replace(filepath, lambda f: f.write(text.encode("utf-8")))
+            return f"Edited '{filepath}': replaced {count if replace_all else 1} occurrence(s)."
+
+        # fall back to a whitespace-insensitive, line-based match
+        lines, newline, final = _load(filepath)
+        block = search.strip("\r\n").splitlines()
+        positions, _ = _find(lines, block, 0, 0)
+        if not positions:
+            return f"Error: `search` was not found in '{filepath}'. Re-read the file and retry."
+        if len(positions) > 1 and not replace_all:
+            where = ", ".join(str(p + 1) for p in positions)
+            return (
+                f"Error: `search` matches {len(positions)} places in '{filepath}' "
+                f"(lines {where}). Include more surrounding lines or set replace_all."
+            )
+        new = replace.strip("\r\n").splitlines()
+        chosen = []  # skip overlapping matches
+        for position in positions:
+            if not chosen or position >= chosen[-1] + len(block):
+                chosen.append(position)
+        positions = chosen
+        for position in reversed(positions):
+            lines[position : position + len(block)] = new
+        _save(filepath, lines, newline, final)
+        where = ", ".join(str(p + 1) for p in positions)
+        return f"Edited '{filepath}': replaced {len(positions)} block(s) at line(s) {where} (whitespace-insensitive match)."
+    except Exception as e:
+        return f"Error: {e}"
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    # self-check: (original lines, diff, expected lines)
+    cases = [
+        ("abcde", "@@ -2,3 +2,3 @@\n b\n-c\n+C\n d\n", "abCde"),
+        ("abcde", "@@ -3,0 +4,2 @@\n+X\n+Y\n", "abcXYde"),  # diff -U0 insertion
+        ("abcde", "@@ -0,0 +1 @@\n+X\n", "Xabcde"),
+        ("abcde", "@@ -3 +2,0 @@\n-c\n", "abde"),
+        ("abcde", " a\n-b\n+B\n", "aBcde"),  # no header
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "check.txt")
+        for original, diff, expected in cases:
+            with open(path, "w") as f:
+                f.write("\n".join(original) + "\n")
+            result = patch(path, diff)
+            with open(path) as f:
+                found = "".join(f.read().split())
+            status = "ok" if found == expected else f"FAILED (got {found!r})"
+            print(f"{diff.splitlines()[0]:<24} -> {expected:<8} {status}")
+            assert found == expected, result
@@ -1,62 +1,503 @@
 """
 Module: agent.tools.registry
+
+Tools are dispatched according to their execution mode:
+
+- thread:  I/O bound and free of side effects. Runs concurrently on a thread pool.
+- serial:  Has side effects. Acts as a barrier: every earlier call finishes before
+           it starts, and it finishes before any later call starts.
+
+Results are always returned in call order. A tool that exceeds its timeout is
+reported to the model as an error; the worker is abandoned rather than killed.
+
+Results of repeatable calls are memoized by `ToolCache`, keyed on the tool name
+and its canonicalised arguments:
+
+- weather: reused for `cache.weather_ttl` seconds.
+- read:    reused while the file's mtime and size are unchanged; dropped when
+           `write`, `patch` or `edit` touches the same path.
+- recall:  reused until the next `store` or `forget`; a hit still counts as a
+           recall of the returned memories (see `memory_touch`).
+- shell:   only read-only programs (e.g. `ls`, `git status`) are reused, for
+           `cache.shell_ttl` seconds; any other program or file edit drops them.
+
+Arguments are validated and coerced against the tool schemas before dispatch
+(see `agent.tools.schema`), and every call is recorded as a span by
+`ToolTracer` (see `agent.tools.trace`).
 """
 
+import functools
 import json
-from typing import Any, Dict
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from agent.config import config
+from agent.tools import _weather, tools
 from agent.tools.file import file_read, file_write
-from agent.tools.memory import memory_forget, memory_recall, memory_store
-from agent.tools.shell import Shell
+from agent.tools.memory import memory_forget, memory_recall, memory_store, memory_touch
+from agent.tools.patch import edit, patch
+from agent.tools.schema import SchemaError, compile_tools
+from agent.tools.shell import BashParser, BashQuery, Shell
+from agent.tools.trace import Span, ToolTracer
 from agent.tools.weather import weather
 
+TOOL_MODES = ("thread", "serial")
+
+# (result, error type, started, finished)
+Outcome = Tuple[str, Optional[str], float, float]
+# (future, deadline, queued, validated arguments)
+Pending = Tuple[Future, Optional[float], float, Dict[str, Any]]
+
+# programs that only inspect the filesystem. `find`, `sed` and `sort` are left
+# out on purpose since they can write (`-delete`, `-i`, `-o`).
+READ_ONLY_COMMANDS = frozenset(
+    (
+        "cat",
+        "head",
+        "tail",
+        "ls",
+        "pwd",
+        "wc",
+        "grep",
+        "diff",
+        "stat",
+        "file",
+        "du",
+        "tree",
+        "echo",
+        "printf",
+        "which",
+    )
+)
+READ_ONLY_GIT = frozenset(
+    ("status", "log", "diff", "show", "blame", "ls-files", "rev-parse", "describe")
+)
+# redirects that do not create or modify files
+READ_ONLY_REDIRECTS = frozenset(("<", "<&", ">&"))
+
+
+def execute(function: Callable[..., str], kwargs: Dict[str, Any]) -> Outcome:
+    """Call a tool, timing it and converting any exception into an error string."""
+    started = time.monotonic()
+    try:
+        result = function(**kwargs)
+        error = "ToolError" if isinstance(result, str) and result.startswith("Error:") else None
+    except Exception as e:
+        result = f"Error: Tool raised exception: {e}"
+        error = type(e).__name__
+    return result, error, started, time.monotonic()
+
+
+def invoke(function: Callable[..., str], kwargs: Dict[str, Any]) -> str:
+    """Call a tool and convert any exception into an error string."""
+    return execute(function, kwargs)[0]
+
+
+class ToolCache:
+    """Memoize tool results with per-tool validity rules."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        weather_ttl: float = 600.0,
+        shell_ttl: float = 5.0,
+    ):
+        self.max_entries = max_entries
+        self.ttl = {"weather": weather_ttl, "shell": shell_ttl}
+        # key -> (result, expires at, validator)
+        self._entries: OrderedDict[str, Tuple[str, Optional[float], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    @staticmethod
+    def key(name: str, args: Dict[str, Any]) -> str:
+        return f"{name}:{json.dumps(args, sort_keys=True, separators=(',', ':'))}"
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def read_only(program: str) -> bool:
+        """Return True if a shell program cannot modify files."""
+        root = BashParser.parse(program)
+        if BashQuery.errors(root) or BashQuery.function_names(root):
+            return False
+        for node in BashQuery.nodes(root, r"""(file_redirect) @redirect"""):
+            operators = {c.type for c in node.children if not c.is_named}
+            destination = node.child_by_field_name("destination")
+            target = destination.text.decode() if destination else ""
+            if not operators <= READ_ONLY_REDIRECTS and target != "/dev/null":
+                return False
+        for node in BashQuery.nodes(root, r"""(command) @command"""):
+            name = node.child_by_field_name("name")
+            if name is None:
+                return False
+            command = name.text.decode()
+            if command == "git":
+                arguments = node.children_by_field_name("argument")
+                if not ToolCache._git_read_only([a.text.decode() for a in arguments]):
+                    return False
+            elif command not in READ_ONLY_COMMANDS:
+                return False
+        return True
+
+    @staticmethod
+    def _git_read_only(arguments: List[str]) -> bool:
+        arguments = iter(arguments)
+        for argument in arguments:
+            if argument == "-C":  # `-C <path>` only changes directory
+                next(arguments, None)
+            elif not argument.startswith("-"):
+                return argument in READ_ONLY_GIT
+            elif argument not in ("--no-pager", "-P"):
+                return False  # e.g. `-c key=value` may enable hooks or aliases
+        return False
+
+    def cacheable(self, name: str, args: Dict[str, Any]) -> bool:
+        if name in ("weather", "read", "recall"):
+            return True
+        if name == "shell":
+            return self.read_only(args.get("program", ""))
+        return False
+
+    def get(self, name: str, args: Dict[str, Any]) -> Optional[str]:
+        if not self.cacheable(name, args):
+            return None
+        key = self.key(name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = None
+            if entry is not None:
+                result, expires, validator = entry
+                fresh = expires is None or time.monotonic() < expires
+                if fresh and validator == self._validator(name, args):
+                    self._entries.move_to_end(key)
+                    self.hits[name] += 1
+                    hit = result
+                else:
+                    del self._entries[key]
+            if hit is None:
+                self.misses[name] += 1
+        if hit is not None and name == "recall":
+            self._touch(hit)
+        return hit
+
+    def put(self, name: str, args: Dict[str, Any], result: str) -> None:
+        """Store a result and apply the invalidation rules of the tool."""
+        self.invalidate(name, args)
+        if not self._succeeded(name, result) or not self.cacheable(name, args):
+            return
+        ttl = self.ttl.get(name)
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[self.key(name, args)] = (result, expires, self._validator(name, args))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, name: str, args: Dict[str, Any]) -> None:
+        """Drop entries that a call to `name` may have made stale."""
+        if name in ("write", "patch", "edit"):
+            path = self._path(args.get("filepath", ""))
+            self._drop(lambda n, a: n == "shell" or (n == "read" and self._path(a.get("filepath", "")) == path))
+        elif name in ("store", "forget"):
+            self._drop(lambda n, a: n == "recall")
+        elif name == "shell" and not self.read_only(args.get("program", "")):
+            self._drop(lambda n, a: n == "shell")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return hits, misses and hit rate per tool."""
+        stats = {}
+        for name in sorted(set(self.hits) | set(self.misses)):
+            hits, misses = self.hits[name], self.misses[name]
+            stats[name] = {"hits": hits, "misses": misses, "rate": hits / (hits + misses)}
+        return stats
+
+    # --- internal ---
+
+    @staticmethod
+    def _path(filepath: str) -> str:
+        return os.path.realpath(filepath) if filepath else ""
+
+    @staticmethod
+    def _validator(name: str, args: Dict[str, Any]) -> Any:
+        if name != "read":
+            return None
+        try:
+            stat = os.stat(args.get("filepath", ""))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _touch(result: str) -> None:
+        """Count a cached recall as an access; eviction ranks memories by it."""
+        try:
+            memory_touch([memory["id"] for memory in json.loads(result)])
+        except (json.JSONDecodeError, KeyError, TypeError, sqlite3.Error):
+            pass  # the cached result is still valid
+
+    @staticmethod
+    def _succeeded(name: str, result: str) -> bool:
+        if not isinstance(result, str) or result.startswith("Error:"):
+            return False
+        if name == "shell":
+            try:
+                return json.loads(result).get("status") == "ok"
+            except json.JSONDecodeError:
+                return False
+        return True
+
+    def _drop(self, predicate: Callable[[str, Dict[str, Any]], bool]) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                name, _, args = key.partition(":")
+                if predicate(name, json.loads(args)):
+                    del self._entries[key]
+
 
 class ToolRegistry:
-    def __init__(self):
+    def __init__(
+        self,
+        max_workers: int = 4,
+        cache: Optional[ToolCache] = None,
+        tracer: Optional[ToolTracer] = None,
+    ):
         self._tools = {
             "weather": weather,
             "access": Shell.access,
             "shell": Shell.run,
             "read": file_read,
             "write": file_write,
+            "patch": patch,
+            "edit": edit,
             "store": memory_store,
             "recall": memory_recall,
             "forget": memory_forget,
         }
+        self._modes = {
+            "weather": "thread",
+            "access": "thread",
+            "shell": "serial",
+            "read": "thread",
+            "write": "serial",
+            "patch": "serial",
+            "edit": "serial",
+            "store": "serial",
+            "recall": "thread",
+            "forget": "serial",
+        }
+        self._timeouts: Dict[str, Optional[float]] = {"weather": 15.0}
+        self._validators = compile_tools(_weather + tools)
+        self._max_workers = max_workers
+        self._threads: Optional[ThreadPoolExecutor] = None
+        # read flags from their section: get_value() replaces False with the default
+        if cache is None and (config.get_value("cache") or {}).get("enabled", True):
+            cache = ToolCache(
+                max_entries=config.get_value("cache.max_entries", 256),
+                weather_ttl=config.get_value("cache.weather_ttl", 600.0),
+                shell_ttl=config.get_value("cache.shell_ttl", 5.0),
+            )
+        self.cache = cache
+        if tracer is None and (config.get_value("trace") or {}).get("enabled", True):
+            tracer = ToolTracer(
+                flush_every=config.get_value("trace.flush_every", 64),
+                flush_interval=config.get_value("trace.flush_interval", 5.0),
+            )
+        self.tracer = tracer
 
-    def register(self, name: str, function: callable):
+    def register(
+        self,
+        name: str,
+        function: callable,
+        mode: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        if mode is not None and mode not in TOOL_MODES:
+            raise ValueError(f"Invalid tool mode '{mode}', expected one of {TOOL_MODES}")
         self._tools[name] = function
+        self._modes[name] = mode or self._modes.get(name, "serial")
+        if timeout is not None:
+            self._timeouts[name] = timeout
+
+    def mode(self, name: str) -> str:
+        return self._modes.get(name, "serial")
 
     def call(self, name: str, **kwargs: Dict[str, Any]) -> str:
-        if name not in self._tools:
-            return f"Error: Tool '{name}' not found."
-        try:
-            return self._tools[name](**kwargs)
-        except Exception as e:
-            return f"Error: Tool raised exception: {e}"
+        queued = time.monotonic()
+        kwargs, outcome = self._lookup(name, kwargs, queued)
+        cached = outcome is not None and outcome[1] is None
+        if outcome is None:
+            outcome = execute(self._tools[name], kwargs)
+            if self.cache:
+                self.cache.put(name, kwargs, outcome[0])
+        self._trace({"name": name}, outcome, queued, cached)
+        return outcome[0]
 
-    def request(self, event: Dict[str, Any]) -> Dict[str, Any]:
-        tool_name = event["tool_call"]["name"]
-        tool_args = event["tool_call"].get("arguments", {})
-        return {
+    def request(
+        self, tool_calls: List[Dict[str, Any]], content: str = ""
+    ) -> Dict[str, Any]:
+        message = {
             "role": "assistant",
             "tool_calls": [
                 {
+                    "id": tool_call["id"],
                     "type": "function",
                     "function": {
-                        "name": tool_name,
-                        "arguments": json.dumps(tool_args),
+                        "name": tool_call["name"],
+                        "arguments": json.dumps(tool_call.get("arguments", {})),
                     },
                 }
+                for tool_call in tool_calls
             ],
         }
+        if content:
+            message["content"] = content
+        return message
 
-    def dispatch(self, event: Dict[str, Any]) -> Dict[str, str]:
-        tool_name = event["tool_call"]["name"]
-        tool_args = event["tool_call"].get("arguments", {})
-        result = self.call(tool_name, **tool_args)
+    def response(self, tool_call: Dict[str, Any], result: str) -> Dict[str, str]:
         return {
             "role": "tool",
-            "name": tool_name,
+            "tool_call_id": tool_call["id"],
+            "name": tool_call["name"],
             "content": result,
         }
+
+    def dispatch(self, tool_call: Dict[str, Any]) -> Dict[str, str]:
+        tool_name = tool_call["name"]
+        tool_args = tool_call.get("arguments", {})
+        result = self.call(tool_name, **tool_args)
+        return self.response(tool_call, result)
+
+    def dispatch_all(self, tool_calls: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Execute tool calls concurrently where safe and return results in order."""
+        results: List[Optional[str]] = [None] * len(tool_calls)
+        pending: Dict[int, Pending] = {}
+
+        try:
+            for i, tool_call in enumerate(tool_calls):
+                mode = self.mode(tool_call["name"])
+                if mode == "serial":
+                    self._wait(tool_calls, pending, results)  # barrier
+                pending[i] = self._submit(tool_call, mode)
+                if mode == "serial":
+                    self._wait(tool_calls, pending, results)
+            self._wait(tool_calls, pending, results)
+        except KeyboardInterrupt:
+            self._cancel(pending)
+            raise
+
+        return [self.response(c, r) for c, r in zip(tool_calls, results)]
+
+    def close(self) -> None:
+        """Flush traces and shut down the worker pools without waiting on abandoned tools."""
+        if self.tracer:
+            self.tracer.close()
+        if self._threads:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+
+    # --- internal ---
+
+    def _executor(self) -> Executor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self._max_workers, thread_name_prefix="tool"
+            )
+        return self._threads
+
+    def _lookup(
+        self, name: str, args: Dict[str, Any], now: float
+    ) -> Tuple[Dict[str, Any], Optional[Outcome]]:
+        """Validate arguments and return the outcome of calls that need no execution."""
+        if name not in self._tools:
+            return args, (f"Error: Tool '{name}' not found.", "NotFound", now, now)
+        validate = self._validators.get(name)
+        if validate is not None:
+            try:
+                args = validate(args, name)
+            except SchemaError as e:
+                return args, (f"Error: Invalid arguments: {e}", "SchemaError", now, now)
+        cached = self.cache.get(name, args) if self.cache else None
+        if cached is not None:
+            return args, (cached, None, now, now)
+        return args, None
+
+    def _submit(self, tool_call: Dict[str, Any], mode: str) -> Pending:
+        name = tool_call["name"]
+        queued = time.monotonic()
+        timeout = self._timeouts.get(name)
+        deadline = queued + timeout if timeout else None
+        args, outcome = self._lookup(name, tool_call.get("arguments", {}), queued)
+        if outcome is not None:
+            future = Future()
+            future.set_result(outcome)
+            future.resolved = True
+            return future, deadline, queued, args
+        future = self._executor().submit(execute, self._tools[name], args)
+        return future, deadline, queued, args
+
+    def _wait(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        pending: Dict[int, Pending],
+        results: List[Optional[str]],
+    ) -> None:
+        """Collect every pending result, honouring per-tool deadlines."""
+        for i in sorted(pending):
+            future, deadline, queued, args = pending[i]
+            tool_call = tool_calls[i]
+            name = tool_call["name"]
+            resolved = getattr(future, "resolved", False)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                outcome = future.result(timeout=remaining)
+                if self.cache and not resolved:
+                    self.cache.put(name, args, outcome[0])
+            except FutureTimeoutError:
+                future.cancel()
+                if self.cache:  # the call may still complete in the background
+                    self.cache.invalidate(name, args)
+                now = time.monotonic()
+                timeout = self._timeouts.get(name)
+                result = f"Error: Tool '{name}' timed out after {timeout}s."
+                outcome = result, "Timeout", now, now
+            except Exception as e:  # e.g. a pool shut down while waiting
+                now = time.monotonic()
+                outcome = f"Error: Tool raised exception: {e}", type(e).__name__, now, now
+            results[i] = outcome[0]
+            self._trace(tool_call, outcome, queued, cached=resolved and outcome[1] is None)
+            del pending[i]
+
+    def _trace(
+        self, tool_call: Dict[str, Any], outcome: Outcome, queued: float, cached: bool
+    ) -> None:
+        if not self.tracer:
+            return
+        result, error, started, finished = outcome
+        if error == "Timeout":  # the worker never reported back
+            started = queued
+        span: Span = {
+            "call_id": tool_call.get("id"),
+            "tool": tool_call["name"],
+            "mode": self.mode(tool_call["name"]),
+            "queue_ms": max(0.0, started - queued) * 1000,
+            "exec_ms": max(0.0, finished - started) * 1000,
+            "output_bytes": len(result.encode("utf-8", errors="replace")),
+            "error": error,
+            "cached": int(cached),
+        }
+        self.tracer.record(span)
+
+    def _cancel(self, pending: Dict[int, Pending]) -> None:
+        for future, *_ in pending.values():
+            future.cancel()
+        pending.clear()
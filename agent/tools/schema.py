@@ -0,0 +1,236 @@
+# agent/tools/schema.py
+"""
+Copyright © 2025 Austin Berrio
+
+Compiled argument validation for tool schemas.
+
+Each tool's JSON schema (see `agent.tools`) is compiled once into a tree of
+closures. Validating a call is then a handful of function calls instead of a
+walk over the schema dictionary, and it happens before dispatch so that bad
+arguments are reported precisely instead of surfacing as a Python exception
+from inside the tool.
+
+Supported keywords: type (including nullable type lists), enum, minimum,
+maximum, properties, required, additionalProperties, default and items.
+
+Models regularly emit near-miss values, so validators coerce where the intent
+is unambiguous: "42" -> 42, 3.0 -> 3, "true" -> True, "Metric" -> "metric".
+
+Usage:
+    validators = compile_tools(tools)
+    args = validators["read"]({"filepath": "a.txt", "start_line": "3"}, "read")
+    # -> {"filepath": "a.txt", "start_line": 3}
+"""
+
+import re
+from typing import Any, Callable, Dict, List
+
+Validator = Callable[[Any, str], Any]
+
+INTEGER = re.compile(r"^\s*[-+]?\d+\s*$")
+_INVALID = object()
+
+
+class SchemaError(ValueError):
+    """Raised when tool arguments do not match the tool's schema."""
+
+
+def _describe(value: Any) -> str:
+    text = repr(value)
+    if len(text) > 40:
+        text = text[:37] + "..."
+    return f"{type(value).__name__} {text}"
+
+
+# --- coercion ---
+
+
+def _string(value: Any) -> Any:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return _INVALID
+
+
+def _integer(value: Any) -> Any:
+    if isinstance(value, bool):
+        return _INVALID
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and INTEGER.match(value):
+        return int(value)
+    return _INVALID
+
+
+def _number(value: Any) -> Any:
+    if isinstance(value, bool):
+        return _INVALID
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return _INVALID
+    return _INVALID
+
+
+def _boolean(value: Any) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return _INVALID
+
+
+def _object(value: Any) -> Any:
+    return value if isinstance(value, dict) else _INVALID
+
+
+def _array(value: Any) -> Any:
+    return value if isinstance(value, list) else _INVALID
+
+
+COERCE = {
+    "string": _string,
+    "integer": _integer,
+    "number": _number,
+    "boolean": _boolean,
+    "object": _object,
+    "array": _array,
+}
+
+
+# --- compilers ---
+
+
+def _compile_type(schema: Dict[str, Any]) -> Validator:
+    types = schema.get("type")
+    if types is None:
+        return lambda value, path: value
+    types = [types] if isinstance(types, str) else list(types)
+    nullable = "null" in types
+    coercers = [COERCE[t] for t in types if t != "null"]
+    expected = " or ".join(types)
+
+    def check(value: Any, path: str) -> Any:
+        if value is None:
+            if nullable:
+                return None
+            raise SchemaError(f"{path}: expected {expected}, got null")
+        for coerce in coercers:
+            coerced = coerce(value)
+            if coerced is not _INVALID:
+                return coerced
+        raise SchemaError(f"{path}: expected {expected}, got {_describe(value)}")
+
+    return check
+
+
+def _compile_enum(schema: Dict[str, Any], inner: Validator) -> Validator:
+    choices = schema["enum"]
+    allowed = set(choices)
+    folded = {c.lower(): c for c in choices if isinstance(c, str)}
+
+    def check(value: Any, path: str) -> Any:
+        value = inner(value, path)
+        if value in allowed:
+            return value
+        if isinstance(value, str) and value.lower() in folded:
+            return folded[value.lower()]
+        raise SchemaError(f"{path}: expected one of {choices}, got {_describe(value)}")
+
+    return check
+
+
+def _compile_range(schema: Dict[str, Any], inner: Validator) -> Validator:
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+
+    def check(value: Any, path: str) -> Any:
+        value = inner(value, path)
+        if value is None:
+            return value
+        if minimum is not None and value < minimum:
+            raise SchemaError(f"{path}: must be >= {minimum}, got {value}")
+        if maximum is not None and value > maximum:
+            raise SchemaError(f"{path}: must be <= {maximum}, got {value}")
+        return value
+
+    return check
+
+
+def _compile_items(schema: Dict[str, Any], inner: Validator) -> Validator:
+    item = compile_schema(schema["items"])
+
+    def check(value: Any, path: str) -> Any:
+        value = inner(value, path)
+        if value is None:
+            return value
+        return [item(v, f"{path}[{i}]") for i, v in enumerate(value)]
+
+    return check
+
+
+def _compile_object(schema: Dict[str, Any], inner: Validator) -> Validator:
+    properties = {
+        name: compile_schema(sub) for name, sub in schema.get("properties", {}).items()
+    }
+    defaults = {
+        name: sub["default"]
+        for name, sub in schema.get("properties", {}).items()
+        if "default" in sub
+    }
+    required = list(schema.get("required", []))
+    closed = schema.get("additionalProperties", True) is False
+
+    def check(value: Any, path: str) -> Any:
+        value = inner(value, path)
+        if value is None:
+            return value
+        missing = [name for name in required if name not in value]
+        if missing:
+            names = ", ".join(f"'{name}'" for name in missing)
+            raise SchemaError(f"{path}: missing required argument(s) {names}")
+        result = {}
+        for name, item in value.items():
+            validate = properties.get(name)
+            if validate is not None:
+                result[name] = validate(item, f"{path}.{name}")
+            elif closed:
+                allowed = ", ".join(properties) or "none"
+                raise SchemaError(f"{path}: unexpected argument '{name}' (allowed: {allowed})")
+            else:
+                result[name] = item
+        for name, default in defaults.items():
+            result.setdefault(name, default)
+        return result
+
+    return check
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile a JSON schema into a validator `(value, path) -> coerced value`."""
+    validator = _compile_type(schema)
+    if "enum" in schema:
+        validator = _compile_enum(schema, validator)
+    if "minimum" in schema or "maximum" in schema:
+        validator = _compile_range(schema, validator)
+    if "items" in schema:
+        validator = _compile_items(schema, validator)
+    if "properties" in schema or "required" in schema:
+        validator = _compile_object(schema, validator)
+    return validator
+
+
+def compile_tools(schemas: List[Dict[str, Any]]) -> Dict[str, Validator]:
+    """Compile the parameters of OpenAI-style tool schemas, keyed by tool name."""
+    validators = {}
+    for schema in schemas:
+        function = schema["function"]
+        parameters = function.get("parameters", {"type": "object"})
+        validators[function["name"]] = compile_schema(parameters)
+    return validators
@@ -98,17 +98,20 @@ feedback.  Use with caution in production; never enable unrestricted access.
 """
 
 
+import atexit
 import functools
 import json
 import shlex
 import shutil
-import subprocess
+import threading
 from pathlib import Path
+from typing import Optional, TypedDict
 
 import tree_sitter_bash
 from tree_sitter import Language, Node, Parser, Point, Query, QueryCursor, Tree
 
 from agent.config import config
+from agent.tools.worker import ShellWorker, run_once
 
 # --- Structures ---
 
@@ -135,6 +138,26 @@ class Terminal:
         """Enable restrictions within a shell process."""
         return config.get_value("terminal.restricted", False)
 
+    @staticmethod
+    def persistent() -> bool:
+        """Run programs in one long-lived shell instead of a shell per program."""
+        return config.get_value("terminal.persistent", False)
+
+    @staticmethod
+    def timeout() -> float:
+        """Wall-clock seconds a program may run before it is killed."""
+        return config.get_value("terminal.timeout", 30.0)
+
+    @staticmethod
+    def stream() -> bool:
+        """Forward program output to the terminal as it arrives."""
+        return config.get_value("terminal.stream", False)
+
+    @staticmethod
+    def limits() -> dict[str, int]:
+        """Resource limits (cpu seconds, memory and file_size bytes) for the shell."""
+        return config.get_value("terminal.limits", {})
+
     @staticmethod
     def command_names() -> list[str]:
         """Copy the list of allowed command names within a shell."""
@@ -142,6 +165,19 @@ class Terminal:
         names = set(names)  # deduplicate
         return list(names)[:]  # copy
 
+    # the snapshot doubles as the allowlist version: validation verdicts are
+    # cached per snapshot, so editing the allowlist invalidates them.
+    @staticmethod
+    def allowlist() -> frozenset[str]:
+        """Return an immutable snapshot of the allowed command names."""
+        names = config.get_value("terminal.command_names", [])
+        return Terminal._snapshot(tuple(names))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _snapshot(names: tuple[str, ...]) -> frozenset[str]:
+        return frozenset(names)
+
 
 # --- Parser ---
 
@@ -149,23 +185,40 @@ class Terminal:
 class BashParser:
     """Thin wrapper around the pre-compiled *bash* language for tree-sitter."""
 
+    # parsers are not thread-safe, so each tool worker thread keeps its own.
+    _local = threading.local()
+
     @staticmethod
     @functools.lru_cache
     def language() -> Language:
         """Return a `Language` instance pointing at the compiled bash grammar."""
         return Language(tree_sitter_bash.language())
 
+    @staticmethod
+    def parser() -> Parser:
+        """Return the parser owned by the calling thread."""
+        parser = getattr(BashParser._local, "parser", None)
+        if parser is None:
+            parser = Parser(BashParser.language())
+            BashParser._local.parser = parser
+        return parser
+
     @staticmethod
     def parse(source: str) -> Node:
         """Parse `source` into a tree-sitter AST and return its root node."""
-        parser = Parser(BashParser.language())
-        tree = parser.parse(source.encode())
+        tree = BashParser.parser().parse(source.encode())
         return tree.root_node
 
 
 # --- Query ---
 
 
+class BashScan(TypedDict):
+    commands: list[Node]  # `command_name` nodes
+    functions: list[Node]  # names of user-defined functions
+    errors: list[Node]  # `ERROR` and `MISSING` nodes
+
+
 class BashQuery:
     """
     Helpers for querying shell scripts with *tree-sitter*.
@@ -181,13 +234,19 @@ class BashQuery:
     #     .venv/lib/python3.13/site-packages/tree_sitter/__init__.pyi
     #   see docs for reference.
     #     https://tree-sitter.github.io/py-tree-sitter/classes/tree_sitter.QueryCursor.html
+    # compiling a query is far more expensive than running it, and queries are
+    # immutable, so each source string is compiled once per process.
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def query(source: str) -> Query:
+        """Return the compiled query for the source text."""
+        return Query(BashParser.language(), source)
+
     @staticmethod
     def captures(root: Node, source: str) -> dict[str, list[Node]]:
         """Return a dictionary containing captured results for the source query."""
-        # create the language query (immutable)
-        query = Query(BashParser.language(), source)
-        # get the cursor for the current query (immutable)
-        cursor = QueryCursor(query)
+        # get a cursor for the compiled query (cursors hold per-run state)
+        cursor = QueryCursor(BashQuery.query(source))
         # return the captured queries (returns a dictionary)
         return cursor.captures(root)
 
@@ -225,6 +284,30 @@ class BashQuery:
         # query captures all errors: includes syntax related issues.
         return BashQuery.nodes(root, r"""( [ (ERROR) (MISSING) ] @marker )""")
 
+    # validation needs commands, functions and errors together, so a single
+    # walk over the tree replaces the three queries above.
+    @staticmethod
+    def scan(root: Node) -> BashScan:
+        """Collect command names, function names and error markers in one pass."""
+        scan = BashScan(commands=[], functions=[], errors=[])
+        cursor = root.walk()
+        while True:
+            node = cursor.node
+            kind = node.type
+            if kind == "command_name":
+                scan["commands"].append(node)
+            elif kind == "function_definition":
+                name = node.child_by_field_name("name")
+                if name is not None:
+                    scan["functions"].append(name)
+            if kind == "ERROR" or node.is_missing:
+                scan["errors"].append(node)
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return scan
+
 
 # --- Response ---
 
@@ -258,40 +341,117 @@ class BashResponse:
             "text": node.text.decode(),
         }
 
+    # the optional `scan` reuses a single-pass traversal from `BashQuery.scan`.
     @staticmethod
-    def lint(root: Node) -> list[dict[str, any]]:
+    def lint(root: Node, scan: Optional[BashScan] = None) -> list[dict[str, any]]:
         """Return a list of objects that contain syntax error metadata."""
-        return [BashResponse.object(node) for node in BashQuery.errors(root)]
+        nodes = scan["errors"] if scan else BashQuery.errors(root)
+        return [BashResponse.object(node) for node in nodes]
 
     # captured commands compared against a user defined allowlist.
     # model defined functions are appended to this list.
     @staticmethod
-    def allowed(root: Node) -> list[str]:
-        """Return a list of allowed command names."""
-        allowlist = Terminal.command_names()  # get a copy
-        for node in BashQuery.function_names(root):
-            allowlist.append(node.text.decode())
-        return allowlist
+    def allowed(root: Node, scan: Optional[BashScan] = None) -> frozenset[str]:
+        """Return the set of allowed command names."""
+        allowlist = Terminal.allowlist()  # immutable snapshot
+        nodes = scan["functions"] if scan else BashQuery.function_names(root)
+        if not nodes:
+            return allowlist
+        return allowlist | {node.text.decode() for node in nodes}
 
     # if the model attempts to violate the access control list,
     # we return a list of violations to allow it to attempt to achieve
     # its goal through (ideally) allowed means.
     @staticmethod
-    def denied(root: Node) -> list[dict[str, any]]:
+    def denied(root: Node, scan: Optional[BashScan] = None) -> list[dict[str, any]]:
         """Return a list of denied command names."""
-        allowlist = BashResponse.allowed(root)
+        allowlist = BashResponse.allowed(root, scan)
+        nodes = scan["commands"] if scan else BashQuery.command_names(root)
         return [
             BashResponse.object(node)
-            for node in BashQuery.command_names(root)
+            for node in nodes
             if node.text.decode() not in allowlist
         ]
 
+    # agents often resend the same program. the verdict only depends on the
+    # program text and the allowlist, so repeated programs skip parsing.
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def verdict(program: str, allowlist: frozenset[str]) -> Optional[str]:
+        """Return the lint or deny response for a program, or None if it may run."""
+        # 1. parse the input program and collect what validation needs
+        root = BashParser.parse(program)
+        scan = BashQuery.scan(root)
+
+        # 2. check if input program has errors
+        errors = BashResponse.lint(root, scan)
+        if errors:
+            return json.dumps({"status": "lint", "errors": errors}, indent=2)
+
+        # 3. check if input program is denied
+        denied = BashResponse.denied(root, scan)
+        if denied:
+            return json.dumps({"status": "deny", "commands": denied}, indent=2)
+
+        return None
+
 
 # --- Tools ---
 
 
 # A tool must be a function, or staticmethod, and it must return a **str**.
 class Shell:
+    # the persistent worker shared by every call in this session.
+    _worker: Optional[ShellWorker] = None
+
+    @staticmethod
+    def worker(args: list[str]) -> ShellWorker:
+        """Return the session's persistent shell, creating it on first use."""
+        if Shell._worker is None or Shell._worker.args != args:
+            if Shell._worker is not None:
+                Shell._worker.close()
+            Shell._worker = ShellWorker(args, Terminal.limits())
+        return Shell._worker
+
+    @staticmethod
+    def close() -> None:
+        """Close the persistent shell, if one is running."""
+        if Shell._worker is not None:
+            Shell._worker.close()
+            Shell._worker = None
+
+    @staticmethod
+    def respond(result: dict[str, any]) -> str:
+        """Serialize an execution result as the structured response for the model."""
+        stdout = result["stdout"].strip() or "(No output)"
+        stderr = result["stderr"].strip() or "(No error)"
+        if result["timeout"]:
+            return json.dumps(
+                {
+                    "status": "error",
+                    "exception": f"Program timed out after {Terminal.timeout()}s and was killed.",
+                    "stderr": stderr,
+                    "stdout": stdout,
+                    "code": None,
+                },
+                indent=2,
+            )
+        if result["code"] != 0:
+            return json.dumps(
+                {
+                    "status": "error",
+                    "exception": f"Program returned non-zero exit status {result['code']}.",
+                    "stderr": stderr,
+                    "stdout": stdout,
+                    "code": result["code"],
+                },
+                indent=2,
+            )
+        return json.dumps(
+            {"status": "ok", "stdout": stdout, "stderr": stderr, "code": 0},
+            indent=2,
+        )
+
     # check to ensure bash command is availble and within environment path.
     @staticmethod
     def path() -> dict[str, str]:
@@ -349,18 +509,10 @@ class Shell:
         if path["status"] == "error":
             return json.dumps(path, indent=2)
 
-        # 1. parse the input program and get the root node
-        root = BashParser.parse(program)
-
-        # 2. check if input program has errors
-        errors = BashResponse.lint(root)
-        if errors:
-            return json.dumps({"status": "lint", "errors": errors}, indent=2)
-
-        # 3. check if input program is denied
-        denied = BashResponse.denied(root)
-        if denied:
-            return json.dumps({"status": "deny", "commands": denied}, indent=2)
+        # check if input program has errors or is denied
+        verdict = BashResponse.verdict(program, Terminal.allowlist())
+        if verdict:
+            return verdict
 
         # note: i need to figure out how to convince bash the input is a file.
         #       for now, I just use the -c option, but the input should be
@@ -380,40 +532,31 @@ class Shell:
         if Terminal.restricted():
             args.append("--restricted")
 
-        # bug:  tree-sitter can not catch the job control operator. even though this
-        #       operation is asynchronous, subprocess.run() still hangs. not sure what
-        #       the default timeout is, but it can hang for a while unless interrupted.
+        # state (cwd, variables, functions) persists between programs
+        if Terminal.persistent():
+            try:
+                worker = Shell.worker(args + ["--noprofile", "--norc"])
+                result = worker.run(program, Terminal.timeout(), Terminal.stream())
+                return Shell.respond(result)
+            except Exception as e:
+                return json.dumps({"status": "error", "exception": str(e)}, indent=2)
+
+        # bug:  tree-sitter can not catch the job control operator. a background job
+        #       keeps the output pipes open, so reading would wait on it forever.
         # note: i inject `set -m` into the models program to disable asynchronous job
         #       control which raises a process exception. this is a temporary fix which
         #       simply alerts the model that it made a mistake with it's input.
         #       i'm not sure if it would confuse it - confusion is undesirable.
+        # note: the wall-clock timeout kills the process group if anything still hangs.
+        #       jobs that `set -m` moved into their own group lose their pipes instead.
 
         # convert the input program into a virtual script
         args.extend(["-c", f"set -m\n{program}"])
 
         # execute the program
         try:
-            result = subprocess.run(args, capture_output=True, check=True, text=True)
-            return json.dumps(
-                {
-                    "status": "ok",
-                    "stdout": result.stdout.strip() or "(No output)",
-                    "stderr": result.stderr.strip() or "(No error)",
-                    "code": result.returncode,
-                },
-                indent=2,
-            )
-        except subprocess.CalledProcessError as e:
-            return json.dumps(
-                {
-                    "status": "error",
-                    "exception": str(e),
-                    "stderr": e.stderr.strip() or "(No error)",
-                    "stdout": e.stdout.strip() or "(No output)",
-                    "code": e.returncode,
-                },
-                indent=2,
-            )
+            result = run_once(args, Terminal.timeout(), Terminal.stream())
+            return Shell.respond(result)
         except Exception as e:
             return json.dumps(
                 {
@@ -424,6 +567,9 @@ class Shell:
             )
 
 
+# one handler for whichever worker is current at exit
+atexit.register(Shell.close)
+
 # general notes and observations:
 # con: tree-sitter only officially supports bash.
 # pro: i don't have to reinvent yet another parser.
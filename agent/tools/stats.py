@@ -0,0 +1,32 @@
+# agent/tools/stats.py
+"""
+Copyright © 2025 Austin Berrio
+
+Latency statistics shared by tool tracing and the benchmark suite.
+"""
+
+import statistics
+from typing import Dict, Iterable
+
+
+def percentile(samples: Iterable[float], q: float) -> float:
+    """Return the q-th percentile (0-100) using linear interpolation."""
+    data = sorted(samples)
+    if not data:
+        return 0.0
+    k = (len(data) - 1) * (q / 100)
+    lo, hi = int(k), min(int(k) + 1, len(data) - 1)
+    return data[lo] + (data[hi] - data[lo]) * (k - lo)
+
+
+def summarize(samples: Iterable[float]) -> Dict[str, float]:
+    """Return mean, p50, p95 and max for a list of samples."""
+    data = list(samples)
+    if not data:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "mean": statistics.fmean(data),
+        "p50": percentile(data, 50),
+        "p95": percentile(data, 95),
+        "max": max(data),
+    }
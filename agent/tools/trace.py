@@ -0,0 +1,179 @@
+# agent/tools/trace.py
+"""
+Copyright © 2025 Austin Berrio
+
+Tool call tracing.
+
+`ToolRegistry` records one span per tool call:
+
+- queue_ms:     time between submission and the start of execution.
+- exec_ms:      time spent inside the tool.
+- output_bytes: size of the result handed back to the model.
+- error:        exception class name, `ToolError` for "Error: ..." results,
+                `Timeout` or `NotFound`.
+- cached:       whether the result came from the tool cache.
+
+Spans are buffered in memory and written to the `tool_traces` table of the
+agent database in batches, so tracing never adds a database round trip to a
+tool call.
+
+Usage:
+    python -m agent.tools.trace report --limit 10
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from agent.config import DEFAULT_PATH_STOR, config
+from agent.tools.database import database_connect
+from agent.tools.stats import percentile
+
+Span = Dict[str, Any]
+
+SPAN_COLUMNS = (
+    "call_id",
+    "tool",
+    "mode",
+    "queue_ms",
+    "exec_ms",
+    "output_bytes",
+    "error",
+    "cached",
+)
+
+
+def trace_initialize(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tool_traces (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT (datetime('now', 'localtime')),
+            call_id TEXT,
+            tool TEXT NOT NULL,
+            mode TEXT,
+            queue_ms REAL,
+            exec_ms REAL,
+            output_bytes INTEGER,
+            error TEXT,
+            cached INTEGER DEFAULT 0
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS tool_traces_tool ON tool_traces (tool)")
+
+
+class ToolTracer:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        flush_every: int = 64,
+        flush_interval: float = 5.0,
+    ):
+        self.path = path or config.get_value("database.path", DEFAULT_PATH_STOR)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._spans: List[Span] = []
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+            due = time.monotonic() - self._flushed >= self.flush_interval
+            if len(self._spans) < self.flush_every and not due:
+                return
+        self.flush()
+
+    def flush(self) -> None:
+        """Write buffered spans to the trace table."""
+        with self._lock:
+            spans, self._spans = self._spans, []
+            self._flushed = time.monotonic()
+            if not spans:
+                return
+            rows = [tuple(span.get(c) for c in SPAN_COLUMNS) for span in spans]
+            with database_connect(self.path) as conn:
+                if not self._ready:
+                    trace_initialize(conn)
+                    self._ready = True
+                conn.executemany(
+                    f"INSERT INTO tool_traces ({', '.join(SPAN_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(SPAN_COLUMNS))})",
+                    rows,
+                )
+
+    def close(self) -> None:
+        self.flush()
+
+
+def trace_report(path: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
+    """Aggregate recorded spans per tool and list the slowest calls."""
+    path = path or config.get_value("database.path", DEFAULT_PATH_STOR)
+    with database_connect(path) as conn:
+        trace_initialize(conn)
+        rows = conn.execute(
+            "SELECT tool, queue_ms, exec_ms, output_bytes, error, cached "
+            "FROM tool_traces ORDER BY tool, exec_ms"
+        ).fetchall()
+        slowest = conn.execute(
+            "SELECT timestamp, tool, call_id, exec_ms, queue_ms, output_bytes, error "
+            "FROM tool_traces ORDER BY exec_ms DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    grouped: Dict[str, List[tuple]] = {}
+    for row in rows:
+        grouped.setdefault(row[0], []).append(row)
+
+    tools = {}
+    for tool, spans in grouped.items():
+        execs = [s[2] or 0.0 for s in spans]  # sorted by the query
+        queues = sorted(s[1] or 0.0 for s in spans)
+        tools[tool] = {
+            "calls": len(spans),
+            "errors": sum(1 for s in spans if s[4]),
+            "cached": sum(1 for s in spans if s[5]),
+            "exec_p50_ms": percentile(execs, 50),
+            "exec_p95_ms": percentile(execs, 95),
+            "queue_p95_ms": percentile(queues, 95),
+            "total_ms": sum(execs),
+            "mean_bytes": sum(s[3] or 0 for s in spans) / len(spans),
+        }
+
+    keys = ("timestamp", "tool", "call_id", "exec_ms", "queue_ms", "output_bytes", "error")
+    return {
+        "tools": dict(sorted(tools.items(), key=lambda t: -t[1]["total_ms"])),
+        "slowest": [dict(zip(keys, row)) for row in slowest],
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Summarize recorded tool call latency.")
+    parser.add_argument("command", choices=["report"], help="Command to run")
+    parser.add_argument("--database", default=None, help="Path to the agent database")
+    parser.add_argument("--limit", type=int, default=10, help="Number of slowest calls")
+    args = parser.parse_args()
+
+    report = trace_report(args.database, args.limit)
+    print(
+        f"{'tool':<10} {'calls':>6} {'errors':>6} {'cached':>6} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'queue p95':>9} {'total ms':>10} {'bytes':>8}"
+    )
+    for tool, s in report["tools"].items():
+        print(
+            f"{tool:<10} {s['calls']:>6} {s['errors']:>6} {s['cached']:>6} "
+            f"{s['exec_p50_ms']:>9.2f} {s['exec_p95_ms']:>9.2f} {s['queue_p95_ms']:>9.2f} "
+            f"{s['total_ms']:>10.1f} {s['mean_bytes']:>8.0f}"
+        )
+    print(f"\nslowest {args.limit}:")
+    for s in report["slowest"]:
+        error = f"  ({s['error']})" if s["error"] else ""
+        print(
+            f"  {s['timestamp']}  {s['tool']:<10} {s['exec_ms']:>9.2f} ms  "
+            f"queue {s['queue_ms']:.2f} ms  {s['output_bytes']} bytes  {s['call_id']}{error}"
+        )
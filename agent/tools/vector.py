@@ -0,0 +1,554 @@
+# agent/tools/vector.py
+"""
+Copyright © 2025 Austin Berrio
+
+In-memory cosine similarity search.
+
+`VectorIndex` keeps L2-normalised float32 vectors in one contiguous matrix, so
+a query is a single matrix-vector product followed by a partial sort of the
+scores. Rows are added and removed in place: the matrix grows geometrically and
+a removed row is filled with the last one, so the index never has to be rebuilt
+while the agent runs.
+
+Embeddings are stored in SQLite as raw float32 blobs (`to_blob` / `from_blob`).
+
+`IVFIndex` is an approximate index over the rows of a `VectorIndex` for stores
+too large to scan on every query. Spherical k-means partitions the vectors into
+`nlist` lists around unit centroids; a query is compared with the centroids and
+only the rows of the `nprobe` closest lists are scored. Raising `nprobe` trades
+latency for recall. The partition (centroids and the list of every key) is
+saved as an `.npz` file; the vectors themselves stay in SQLite.
+
+`QuantizedIndex` holds compressed codes instead of float32 vectors:
+    - int8:   every component rounded to int8 with a per-vector scale (4x smaller).
+    - binary: the sign of every component, packed 8 per byte (32x smaller) and
+              compared by Hamming distance.
+Its scores are approximate; callers re-score the best `k * oversample`
+candidates with the float vectors.
+
+Usage:
+    index = VectorIndex()
+    index.add(1, embedding)
+    index.search(query, k=5)  # -> [(1, 0.93), ...]
+
+    ivf = IVFIndex.train(index, nlist=1024, nprobe=8)
+    ivf.search(query, k=5)
+
+    codes = QuantizedIndex("int8")
+    codes.add_many([1], [embedding])
+    codes.search(query, k=20)  # candidates to re-score
+"""
+
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def normalize(vectors: Any) -> np.ndarray:
+    """Return float32 copies of the vectors (rows) scaled to unit length."""
+    array = np.array(vectors, dtype=np.float32, ndmin=1)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return array / norms
+
+
+def to_blob(vector: np.ndarray) -> bytes:
+    return np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+
+
+def from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k largest scores, best first."""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    def __init__(self, dim: Optional[int] = None, capacity: int = 1024):
+        self.dim = dim
+        self._capacity = capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._keys = np.empty(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}  # key -> row
+        self._size = 0
+        self._version = 0  # bumped when existing rows change (not on append)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._rows
+
+    @property
+    def version(self) -> int:
+        """Changes whenever a stored row is replaced, moved or removed."""
+        return self._version
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The stored vectors; row i belongs to keys[i]."""
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            return self._matrix[: self._size]
+
+    @property
+    def keys(self) -> np.ndarray:
+        with self._lock:
+            return self._keys[: self._size]
+
+    def rows(self, keys: np.ndarray) -> np.ndarray:
+        """Return the row of each key, or -1 for unknown keys."""
+        with self._lock:
+            return np.array([self._rows.get(k, -1) for k in keys.tolist()], dtype=np.int64)
+
+    def add(self, key: int, vector: np.ndarray) -> None:
+        """Insert or replace the vector stored under `key`."""
+        vector = normalize(vector)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vector.shape[-1]
+            if vector.shape != (self.dim,):
+                raise ValueError(f"expected a vector of {self.dim} dimensions, got {vector.shape}")
+            row = self._rows.get(key)
+            if row is None:
+                self._reserve(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._rows[key] = row
+                self._keys[row] = key
+            else:
+                self._version += 1
+            self._matrix[row] = vector
+
+    def add_many(self, keys: Any, vectors: Any) -> None:
+        """Insert or replace many vectors (rows) at once."""
+        keys = np.asarray(keys, dtype=np.int64)
+        vectors = normalize(np.atleast_2d(vectors))
+        if len(keys) != len(vectors):
+            raise ValueError(f"got {len(keys)} keys for {len(vectors)} vectors")
+        if len(keys) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"expected {self.dim} dimensions, got {vectors.shape[1]}")
+            rows = np.array([self._rows.get(k, -1) for k in keys.tolist()], dtype=np.int64)
+            known = rows >= 0
+            if known.any():
+                self._matrix[rows[known]] = vectors[known]
+                self._version += 1
+            # append new keys; a key repeated within the batch keeps its last vector
+            new_keys, last = np.unique(keys[~known][::-1], return_index=True)
+            count = len(new_keys)
+            start = self._size
+            self._reserve(start + count)
+            self._matrix[start : start + count] = vectors[~known][::-1][last]
+            self._keys[start : start + count] = new_keys
+            self._rows.update(zip(new_keys.tolist(), range(start, start + count)))
+            self._size += count
+
+    def remove(self, key: int) -> bool:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            self._version += 1
+            if row != last:
+                # move the last row into the hole
+                self._matrix[row] = self._matrix[last]
+                self._keys[row] = self._keys[last]
+                self._rows[int(self._keys[row])] = row
+            self._size = last
+            return True
+
+    def get(self, key: int) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(key)
+            return None if row is None else self._matrix[row].copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._size = 0
+            self._version += 1
+
+    def search(
+        self, vector: np.ndarray, k: int = 5, threshold: Optional[float] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (key, cosine similarity) pairs, most similar first."""
+        query = normalize(vector)
+        with self._lock:
+            if self._size == 0 or query.shape != (self.dim,):
+                return []
+            scores = self._matrix[: self._size] @ query
+            best = top_k(scores, k)
+            keys = self._keys[best]
+        results = [(int(key), float(scores[i])) for key, i in zip(keys, best)]
+        if threshold is not None:
+            results = [(key, score) for key, score in results if score >= threshold]
+        return results
+
+    def search_batch(
+        self, vectors: np.ndarray, k: int = 5, threshold: Optional[float] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Search for several vectors (rows) with one matrix product."""
+        queries = normalize(np.atleast_2d(vectors))
+        with self._lock:
+            if self._size == 0 or queries.shape[1] != self.dim:
+                return [[] for _ in queries]
+            scores = queries @ self._matrix[: self._size].T
+            keys = self._keys[: self._size].copy()
+        results = []
+        for row in scores:
+            best = top_k(row, k)
+            hits = [(int(keys[i]), float(row[i])) for i in best]
+            if threshold is not None:
+                hits = [(key, score) for key, score in hits if score >= threshold]
+            results.append(hits)
+        return results
+
+    def _reserve(self, size: int) -> None:
+        if self._matrix is not None and size <= self._matrix.shape[0]:
+            return
+        current = 0 if self._matrix is None else self._matrix.shape[0]
+        capacity = max(self._capacity, size, 2 * current)
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        keys = np.empty(capacity, dtype=np.int64)
+        if self._matrix is not None:
+            matrix[: self._size] = self._matrix[: self._size]
+            keys[: self._size] = self._keys[: self._size]
+        self._matrix, self._keys = matrix, keys
+
+
+#
+# Approximate search
+#
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 16384) -> np.ndarray:
+    """Return the index of the most similar centroid for each vector (row)."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for lo in range(0, len(vectors), block):
+        labels[lo : lo + block] = np.argmax(vectors[lo : lo + block] @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit vectors; returns k unit centroids."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=k) == 0
+        # restart empty lists from random vectors
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted file index over the rows of a `VectorIndex`.
+
+    Appended rows are assigned to a list incrementally. Replacing, removing or
+    clearing rows changes `VectorIndex.version`, and the next search assigns
+    every row again against the same centroids.
+    """
+
+    def __init__(self, vectors: VectorIndex, centroids: np.ndarray, nprobe: int = 8):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.nprobe = nprobe
+        self.trained = len(vectors)  # rows the centroids were trained on
+        self.saved = 0  # rows in the last saved partition
+        self._labels = np.empty(0, dtype=np.int32)  # list of each row; -1 unassigned
+        self._version = vectors.version  # rows the labels were computed for
+        self._members: Optional[np.ndarray] = None  # rows sorted by list
+        self._offsets: Optional[np.ndarray] = None  # list i is members[offsets[i]:offsets[i + 1]]
+        self._lock = threading.Lock()
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(
+        cls,
+        vectors: VectorIndex,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Partition the vectors; `nlist` defaults to the square root of their count."""
+        matrix = vectors.matrix
+        nlist = nlist or max(1, int(np.sqrt(len(matrix))))
+        rng = np.random.default_rng(seed)
+        sample = min(len(matrix), 64 * nlist)  # plenty for stable centroids
+        picked = matrix[np.sort(rng.choice(len(matrix), sample, replace=False))]
+        index = cls(vectors, kmeans(picked, nlist, iterations, seed), nprobe)
+        index.update()
+        return index
+
+    def update(self) -> None:
+        """Assign rows added to the vector index since the last call."""
+        with self._lock:
+            self._update()
+
+    def search(
+        self, vector: np.ndarray, k: int = 5, nprobe: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (key, cosine similarity) pairs from the closest lists."""
+        query = normalize(vector)
+        if query.shape != (self.centroids.shape[1],):
+            return []
+        with self._lock:
+            self._update()
+            members, offsets = self._members, self._offsets
+        probe = top_k(self.centroids @ query, nprobe or self.nprobe)
+        rows = np.concatenate([members[offsets[i] : offsets[i + 1]] for i in probe])
+        matrix, keys = self.vectors.matrix, self.vectors.keys
+        scores = matrix[rows] @ query
+        best = top_k(scores, k)
+        return [(int(keys[rows[i]]), float(scores[i])) for i in best]
+
+    def save(self, path: str) -> None:
+        """Write the centroids and the list of every key (atomically)."""
+        with self._lock:
+            self._update()
+            keys = self.vectors.keys[: len(self._labels)]
+            order = np.argsort(keys)
+            directory = os.path.dirname(path) or "."
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    np.savez(
+                        file,
+                        centroids=self.centroids,
+                        keys=keys[order],
+                        labels=self._labels[order],
+                        trained=self.trained,
+                    )
+                os.replace(tmp, path)
+                self.saved = len(keys)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    @classmethod
+    def load(cls, path: str, vectors: VectorIndex, nprobe: int = 8) -> Optional["IVFIndex"]:
+        """Restore a saved partition, or None if it is missing or does not fit."""
+        try:
+            data = np.load(path)
+        except (OSError, ValueError):
+            return None
+        with data:
+            centroids = data["centroids"]
+            if vectors.dim is None or centroids.shape[1] != vectors.dim:
+                return None
+            index = cls(vectors, centroids, nprobe)
+            index.trained = int(data["trained"])
+            index.saved = len(data["keys"])
+            labels = np.full(len(vectors), -1, dtype=np.int32)
+            rows = vectors.rows(data["keys"])
+            found = rows >= 0
+            labels[rows[found]] = data["labels"][found]
+        index._labels = labels
+        index.update()  # rows stored after the partition was saved
+        return index
+
+    def _update(self) -> None:
+        size = len(self.vectors)
+        if self.vectors.version != self._version:
+            # rows were replaced or moved: every label may be stale
+            self._version = self.vectors.version
+            self._labels = np.full(size, -1, dtype=np.int32)
+            self._members = None
+        if size > len(self._labels):
+            grown = np.full(size - len(self._labels), -1, dtype=np.int32)
+            self._labels = np.concatenate([self._labels, grown])
+        missing = np.flatnonzero(self._labels < 0)
+        if len(missing) == 0 and self._members is not None:
+            return
+        if len(missing):
+            self._labels[missing] = assign(self.vectors.matrix[missing], self.centroids)
+        self._members = np.argsort(self._labels, kind="stable")
+        counts = np.bincount(self._labels, minlength=self.nlist)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+
+#
+# Quantized search
+#
+
+QUANTIZE_MODES = ("int8", "binary")
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def quantize(vectors: Any, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return (codes, scales) for the vectors (rows); binary codes have no scales."""
+    vectors = normalize(np.atleast_2d(vectors))
+    if mode == "binary":
+        return np.packbits(vectors > 0, axis=1), None
+    if mode != "int8":
+        raise ValueError(f"unknown quantization {mode!r}, expected one of {QUANTIZE_MODES}")
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Return the number of set bits in each row of a uint64 matrix."""
+    if hasattr(np, "bitwise_count"):  # NumPy 2
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[words.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedIndex:
+    """Approximate cosine search over int8 or binary codes."""
+
+    def __init__(self, mode: str = "int8", dim: Optional[int] = None, capacity: int = 1024):
+        if mode not in QUANTIZE_MODES:
+            raise ValueError(f"unknown quantization {mode!r}, expected one of {QUANTIZE_MODES}")
+        self.mode = mode
+        self.dim = dim
+        self._capacity = capacity
+        self._codes: Optional[np.ndarray] = None
+        self._scales = np.empty(0, dtype=np.float32)
+        self._keys = np.empty(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}  # key -> row
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._rows
+
+    @property
+    def width(self) -> int:
+        """Bytes per stored code; binary codes are padded to whole 64-bit words."""
+        if self.mode == "int8":
+            return self.dim
+        return -(-self.dim // 64) * 8
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the codes and scales of the stored vectors."""
+        scale = 4 if self.mode == "int8" else 0
+        return self._size * (self.width + scale)
+
+    def add_many(self, keys: Any, vectors: Any) -> None:
+        """Quantize and insert or replace many vectors (rows)."""
+        vectors = np.atleast_2d(vectors)
+        if self.dim is None and vectors.size:
+            self.dim = vectors.shape[1]
+        if vectors.size and vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim} dimensions, got {vectors.shape[1]}")
+        codes, scales = quantize(vectors, self.mode)
+        self.add_codes(keys, codes, scales)
+
+    def add_codes(self, keys: Any, codes: np.ndarray, scales: Optional[np.ndarray] = None) -> None:
+        """Insert or replace codes produced by `quantize` (e.g. read from SQLite)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(keys) != len(codes):
+            raise ValueError(f"got {len(keys)} keys for {len(codes)} codes")
+        if len(keys) == 0:
+            return
+        if self.dim is None:
+            raise ValueError("the dimensions of binary codes must be given")
+        codes = self._pad(codes)
+        if scales is None:
+            scales = np.ones(len(keys), dtype=np.float32)
+        with self._lock:
+            rows = np.array([self._rows.get(k, -1) for k in keys.tolist()], dtype=np.int64)
+            known = rows >= 0
+            if known.any():
+                self._codes[rows[known]] = codes[known]
+                self._scales[rows[known]] = scales[known]
+            # append new keys; a key repeated within the batch keeps its last code
+            new_keys, last = np.unique(keys[~known][::-1], return_index=True)
+            count = len(new_keys)
+            start = self._size
+            self._reserve(start + count)
+            self._codes[start : start + count] = codes[~known][::-1][last]
+            self._scales[start : start + count] = scales[~known][::-1][last]
+            self._keys[start : start + count] = new_keys
+            self._rows.update(zip(new_keys.tolist(), range(start, start + count)))
+            self._size += count
+
+    def search(self, vector: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        """Return up to k (key, approximate cosine similarity) pairs, best first."""
+        query = normalize(vector)
+        with self._lock:
+            if self._size == 0 or query.shape != (self.dim,):
+                return []
+            if self.mode == "int8":
+                scores = self._dot(query)
+            else:
+                scores = self._hamming(query)
+            best = top_k(scores, k)
+            keys = self._keys[best]
+        return [(int(key), float(scores[i])) for key, i in zip(keys, best)]
+
+    def _dot(self, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(self._size, dtype=np.float32)
+        block = max(1, (1 << 16) // self.dim)  # 256 KiB of float32 stays in cache
+        for lo in range(0, self._size, block):
+            hi = min(lo + block, self._size)
+            scores[lo:hi] = self._codes[lo:hi].astype(np.float32) @ query
+        return scores * self._scales[: self._size]
+
+    def _hamming(self, query: np.ndarray) -> np.ndarray:
+        bits = self._pad(np.packbits(query > 0)[None, :]).view(np.uint64)[0]
+        words = self._codes[: self._size].view(np.uint64)
+        distance = np.empty(self._size, dtype=np.int32)
+        block = 65536
+        for lo in range(0, self._size, block):
+            distance[lo : lo + block] = popcount(words[lo : lo + block] ^ bits)
+        # the fraction of differing signs estimates the angle between the vectors
+        return np.cos(np.pi * distance / self.dim).astype(np.float32)
+
+    def _pad(self, codes: np.ndarray) -> np.ndarray:
+        dtype = np.int8 if self.mode == "int8" else np.uint8
+        codes = np.asarray(codes, dtype=dtype)
+        if codes.shape[1] == self.width:
+            return codes
+        padded = np.zeros((len(codes), self.width), dtype=dtype)
+        padded[:, : codes.shape[1]] = codes
+        return padded
+
+    def _reserve(self, size: int) -> None:
+        if self._codes is not None and size <= self._codes.shape[0]:
+            return
+        current = 0 if self._codes is None else self._codes.shape[0]
+        capacity = max(self._capacity, size, 2 * current)
+        dtype = np.int8 if self.mode == "int8" else np.uint8
+        codes = np.empty((capacity, self.width), dtype=dtype)
+        scales = np.empty(capacity, dtype=np.float32)
+        keys = np.empty(capacity, dtype=np.int64)
+        if self._codes is not None:
+            codes[: self._size] = self._codes[: self._size]
+            scales[: self._size] = self._scales[: self._size]
+            keys[: self._size] = self._keys[: self._size]
+        self._codes, self._scales, self._keys = codes, scales, keys
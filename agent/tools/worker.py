@@ -0,0 +1,340 @@
+# agent/tools/worker.py
+"""
+Copyright © 2025 Austin Berrio
+
+Shell process execution.
+
+`run_once` executes a program in a fresh process. `ShellWorker` keeps a shell
+alive between programs. Both read stdout and stderr incrementally into output
+budgets (see `agent.tools.output`), optionally echo them to the terminal as they
+arrive, and kill the whole process group once the wall-clock timeout passes.
+
+A `ShellWorker` keeps one bash process alive for the whole session so that the
+working directory, variables and functions carry over between programs and
+chains of small programs do not pay process startup every time.
+
+Protocol:
+    Each (already validated) program is sent over stdin as a quoted here-document
+    delimited by a random nonce, read into a variable and `eval`'d with stdin
+    redirected from /dev/null so that it can never consume the protocol stream.
+    Once it returns, the worker prints `\\n__AGENT_<nonce>__:<status>\\n` to
+    stdout. Output before the marker belongs to the program; stderr is drained
+    once the marker arrives. The nonce is unknown to the program, so it cannot
+    forge the end of its own output.
+
+Failure handling:
+    - A program that exceeds its timeout has the worker's whole process group
+      killed; a fresh worker is started for the next program.
+    - A program that exits the shell (`exit`, a fatal signal, `set -e`) ends the
+      worker; its status is reported and the worker is restarted lazily.
+
+Resource limits (CPU seconds, address space, file size) are applied to the bash
+process with `prlimit` right after it starts, before any program is sent, and
+are inherited by every command it runs. Note that the CPU limit is cumulative
+for loops executed by bash itself; exceeding it ends the worker.
+"""
+
+import os
+import resource
+import secrets
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+from agent.tools.output import OutputBudget
+
+RESOURCE_LIMITS = {
+    "cpu": resource.RLIMIT_CPU,  # seconds
+    "memory": resource.RLIMIT_AS,  # bytes
+    "file_size": resource.RLIMIT_FSIZE,  # bytes
+}
+
+
+def apply_limits(pid: int, limits: Dict[str, int]) -> None:
+    """Lower the soft and hard limits of a running process (0 means unlimited)."""
+    for name, value in limits.items():
+        if value:
+            resource.prlimit(pid, RESOURCE_LIMITS[name], (value, value))
+
+
+class StreamReader:
+    """Feed pipe data into an output budget, optionally stopping at a marker."""
+
+    def __init__(
+        self,
+        budget: OutputBudget,
+        marker: Optional[bytes] = None,
+        echo: Optional[BinaryIO] = None,
+    ):
+        self.budget = budget
+        self.marker = marker
+        self.echo = echo
+        self.done = False
+        self.trailer = bytearray()  # bytes received after the marker
+        self._pending = bytearray()  # bytes that may be the start of the marker
+
+    def feed(self, data: bytes) -> None:
+        if self.done:
+            self.trailer += data
+            return
+        if self.marker is None:
+            self._emit(data)
+            return
+        self._pending += data
+        index = self._pending.find(self.marker)
+        if index >= 0:
+            self._emit(self._pending[:index])
+            self.trailer += self._pending[index + len(self.marker) :]
+            self._pending.clear()
+            self.done = True
+            return
+        cut = len(self._pending) - (len(self.marker) - 1)
+        if cut > 0:
+            self._emit(self._pending[:cut])
+            del self._pending[:cut]
+
+    def flush(self) -> None:
+        """Emit bytes held back while looking for the marker."""
+        self._emit(self._pending)
+        self._pending.clear()
+
+    def _emit(self, data: bytes) -> None:
+        if not data:
+            return
+        self.budget.write(bytes(data))
+        if self.echo is not None:
+            self.echo.write(data)
+            self.echo.flush()
+
+
+def pump(
+    readers: Dict[BinaryIO, StreamReader],
+    until: Callable[[], bool],
+    deadline: Optional[float] = None,
+    interval: Optional[float] = None,
+) -> str:
+    """Read pipes into their readers.
+
+    Returns "done" once `until()` holds, "eof" once every pipe is closed, or
+    "timeout" once `deadline` (a `time.monotonic()` value) passes. `until()` is
+    checked after every read and at least every `interval` seconds.
+    """
+    selector = selectors.DefaultSelector()
+    for pipe, reader in readers.items():
+        selector.register(pipe, selectors.EVENT_READ, reader)
+    remaining = len(readers)
+    try:
+        while not until():
+            if remaining == 0:
+                return "eof"
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return "timeout"
+            if interval is not None:
+                timeout = interval if timeout is None else min(timeout, interval)
+            for key, _ in selector.select(timeout):
+                try:
+                    data = os.read(key.fd, 65536)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.data.flush()
+                    remaining -= 1
+                    continue
+                key.data.feed(data)
+        return "done"
+    finally:
+        selector.close()
+
+
+def kill_group(process: subprocess.Popen) -> None:
+    """Kill a process started with `start_new_session` and its process group."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def run_once(
+    args: List[str],
+    timeout: Optional[float] = None,
+    echo: bool = False,
+) -> Dict[str, Any]:
+    """Execute a command and return its output, exit code and timeout state."""
+    stdout = StreamReader(OutputBudget(), echo=sys.stdout.buffer if echo else None)
+    stderr = StreamReader(OutputBudget(), echo=sys.stderr.buffer if echo else None)
+    deadline = time.monotonic() + timeout if timeout else None
+
+    process = subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,  # own process group so that a timeout kills it all
+    )
+    with process:
+        os.set_blocking(process.stdout.fileno(), False)
+        os.set_blocking(process.stderr.fileno(), False)
+        # background jobs may hold the pipes open after the shell exits,
+        # so stop at whichever comes first: end of output or end of the shell.
+        state = pump(
+            {process.stdout: stdout, process.stderr: stderr},
+            until=lambda: process.poll() is not None,
+            deadline=deadline,
+            interval=0.05,
+        )
+        if state == "done":
+            drain(process.stdout, stdout)
+            drain(process.stderr, stderr)
+        elif state == "eof":
+            # the pipes may close before the process exits
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                process.wait(timeout=remaining)
+            except subprocess.TimeoutExpired:
+                state = "timeout"
+        if state == "timeout":
+            kill_group(process)
+
+    timed_out = state == "timeout"
+    return {
+        "stdout": stdout.budget.text(),
+        "stderr": stderr.budget.text(),
+        "code": None if timed_out else process.returncode,
+        "timeout": timed_out,
+    }
+
+
+def drain(pipe: BinaryIO, reader: StreamReader) -> None:
+    """Read whatever a non-blocking pipe currently holds."""
+    while True:
+        try:
+            data = os.read(pipe.fileno(), 65536)
+        except BlockingIOError:
+            break
+        if not data:
+            break
+        reader.feed(data)
+    reader.flush()
+
+
+class ShellWorker:
+    def __init__(self, args: List[str], limits: Optional[Dict[str, int]] = None):
+        self.args = args
+        self.limits = limits or {}
+        self.process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            self.args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,  # own process group; immune to the CLI's Ctrl-C
+        )
+        try:
+            apply_limits(self.process.pid, self.limits)
+        except (OSError, ValueError):
+            self.kill()
+            raise
+        os.set_blocking(self.process.stdout.fileno(), False)
+        os.set_blocking(self.process.stderr.fileno(), False)
+
+    def run(
+        self,
+        program: str,
+        timeout: Optional[float] = None,
+        echo: bool = False,
+    ) -> Dict[str, Any]:
+        """Execute a program and return its output, exit code and timeout state."""
+        with self._lock:
+            if not self.alive:
+                self.start()
+
+            marker = f"__AGENT_{secrets.token_hex(16)}__"
+            script = (
+                f"IFS= read -r -d '' __agent_program <<'{marker}'\n"
+                f"{program}\n"
+                f"{marker}\n"
+                f'eval "$__agent_program" < /dev/null\n'
+                f"builtin printf '\\n{marker}:%d\\n' \"$?\"\n"
+            )
+
+            stdout = StreamReader(
+                OutputBudget(),
+                marker=f"\n{marker}:".encode(),
+                echo=sys.stdout.buffer if echo else None,
+            )
+            stderr = StreamReader(
+                OutputBudget(), echo=sys.stderr.buffer if echo else None
+            )
+            deadline = time.monotonic() + timeout if timeout else None
+
+            try:
+                self.process.stdin.write(script.encode())
+                self.process.stdin.flush()
+            except BrokenPipeError:
+                pass  # the worker died; pump() reports eof
+
+            state = pump(
+                {self.process.stdout: stdout, self.process.stderr: stderr},
+                until=lambda: stdout.done and b"\n" in stdout.trailer,
+                deadline=deadline,
+            )
+
+            code = None
+            if state == "done":
+                drain(self.process.stderr, stderr)
+                code = int(stdout.trailer.split(b"\n", 1)[0])
+            elif state == "eof":  # the program ended the shell
+                code = self.process.wait()
+                self._release()
+            else:
+                self.kill()
+
+            return {
+                "stdout": stdout.budget.text(),
+                "stderr": stderr.budget.text(),
+                "code": code,
+                "timeout": state == "timeout",
+            }
+
+    def kill(self) -> None:
+        """Kill the worker and everything it started."""
+        if self.process is None:
+            return
+        kill_group(self.process)
+        self._release()
+
+    def close(self) -> None:
+        """Let the worker exit on end of input, killing it if it does not."""
+        with self._lock:
+            if self.process is None:
+                return
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=1.0)
+                self._release()
+            except (OSError, subprocess.TimeoutExpired):
+                self.kill()
+
+    def _release(self) -> None:
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self.process = None